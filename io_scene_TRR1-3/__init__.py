@@ -22,6 +22,16 @@ if "bpy" in locals():
         reload(pdp_utils)
     if "bin_parse" in locals():
         reload(bin_parse)
+    if "trm_format" in locals():
+        reload(trm_format)
+    if "trm_cache" in locals():
+        reload(trm_cache)
+    if "tex_convert" in locals():
+        reload(tex_convert)
+    if "dds_decode" in locals():
+        reload(dds_decode)
+    if "skeleton_data" in locals():
+        reload(skeleton_data)
     if "trm_import" in locals():
         reload(trm_import)
     if "trm_export" in locals():
@@ -34,7 +44,7 @@ if "bpy" in locals():
         reload(ui)
     del reload
 
-from . import addon_updater_ops, utils, pdp_utils, bin_parse, trm_import, trm_export, pose_ops, ops, ui
+from . import addon_updater_ops, utils, pdp_utils, bin_parse, trm_format, trm_cache, tex_convert, dds_decode, skeleton_data, trm_import, trm_export, pose_ops, ops, ui
 import bpy, os
 
 @addon_updater_ops.make_annotations
@@ -89,6 +99,14 @@ class TR123R_PT_Preferences(bpy.types.AddonPreferences):
         default="POSE.txt"
     )
 
+    trm_cache_size: bpy.props.IntProperty(
+        name="TRM Cache Size (MB)",
+        description='Maximum disk space for decoded TRM data reused by "Use Cache" import option.\n'
+                    'Least recently imported files are removed first, 0 disables the cache',
+        default=512,
+        min=0
+    )
+
     # --------------------- Addon updater preferences --------------------- #
 
     auto_check_update = bpy.props.BoolProperty(
@@ -133,6 +151,7 @@ class TR123R_PT_Preferences(bpy.types.AddonPreferences):
         col.prop(self, 'tex_conv_directory')
         col.prop(self, 'game_path')
         col.prop(self, 'pose_filepath')
+        col.prop(self, 'trm_cache_size')
 
         col.separator()
 
@@ -144,6 +163,12 @@ class TR123R_PT_Preferences(bpy.types.AddonPreferences):
         row = col.row()
         row.label(text='Generate Bone Data for TRMs:')
         row.operator('io_tombraider123r.generate_skeleton_data')
+        op = row.operator('io_tombraider123r.generate_skeleton_data', text="Rebuild")
+        op.rebuild = True
+
+        row = col.row()
+        row.label(text='Remove cached TRM data:')
+        row.operator('io_tombraider123r.clear_trm_cache')
 
         col.separator()
 
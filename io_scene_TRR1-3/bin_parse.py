@@ -1,8 +1,20 @@
-from struct import unpack
+import numpy as np
+from struct import unpack, unpack_from, calcsize
 TRM_HEADER = 0x54524d02
 TRM_FORMAT = '.TRM'
 TRM_ANIM_FORMAT = '.TRMA'
 
+TRM_VERTEX_DTYPE = np.dtype([
+    ('pos', '<f4', 3),      # position in XYZ order
+    ('normal', 'u1', 3),    # normal bytes in XYZ order, offset by 127
+    ('tex', 'u1'),          # texture index, starting from 1
+    ('joints', 'u1', 3),    # joint (vertex group) IDs
+    ('u', 'u1'),            # U coordinate in 1/255 steps
+    ('weights', 'u1', 3),   # joint weights in 1/255 steps
+    ('v', 'u1'),            # inverted V coordinate in 1/255 steps
+])
+"""Structured layout of a single TRM vertex, equivalent to '<fff12B' (24 bytes)"""
+
 def is_TRM_header(file) -> bool:
     """Reads first 4 bytes and returns bool whether they're a TRM header."""
     file.seek(0)
@@ -34,4 +46,48 @@ def read_ushort16_tuple(file, size=1):
 
 def read_uint8_tuple(file, size=1):
     """Read values and return a tuple of 'size' unsigned chars from a byte each."""
-    return unpack('<%dB' % size, file.read(size))
\ No newline at end of file
+    return unpack('<%dB' % size, file.read(size))
+
+class BinReader:
+    """Sequential reader of little-endian values from a single in-memory buffer (bytes, mmap, memoryview).\n
+    Uses struct.unpack_from and np.frombuffer at offsets, so arrays are views into the buffer without copying."""
+    def __init__(self, buffer, offset=0):
+        self.buffer = buffer
+        self.offset = offset
+
+    def tell(self) -> int:
+        return self.offset
+
+    def seek(self, offset, whence=0):
+        """Move to 'offset' from buffer start (whence=0) or from current position (whence=1)."""
+        self.offset = offset if whence == 0 else self.offset + offset
+
+    def align(self, size=4):
+        """Skip padding bytes up to the next multiple of 'size'."""
+        if self.offset % size: self.offset += size - (self.offset % size)
+
+    def unpack(self, fmt) -> tuple:
+        """Unpack values of struct format 'fmt' at current position."""
+        values = unpack_from(fmt, self.buffer, self.offset)
+        self.offset += calcsize(fmt)
+        return values
+
+    def read_uint32(self) -> int:
+        return self.unpack('<I')[0]
+
+    def read_int32(self) -> int:
+        return self.unpack('<i')[0]
+
+    def read_ushort16(self) -> int:
+        return self.unpack('<H')[0]
+
+    def read_array(self, dtype, size=1) -> np.ndarray:
+        """Return a read-only array view of 'size' values of 'dtype' at current position."""
+        dtype = np.dtype(dtype)
+        array = np.frombuffer(self.buffer, dtype=dtype, count=size, offset=self.offset)
+        self.offset += dtype.itemsize * size
+        return array
+
+    def read_vertex_array(self, size=1) -> np.ndarray:
+        """Return 'size' vertices as a structured array view of TRM_VERTEX_DTYPE."""
+        return self.read_array(TRM_VERTEX_DTYPE, size)
\ No newline at end of file
@@ -0,0 +1,389 @@
+"""Decoding of DDS textures into RGBA arrays with numpy, without external tools.
+
+Supports top mip level of uncompressed formats, BC1-BC5 and BC7 (all modes).
+Other formats, and damaged files, raise DDSUnsupportedError, so the caller can
+fall back to an external converter or skip the texture.
+"""
+import numpy as np
+from struct import unpack_from
+
+DDS_MAGIC = b'DDS '
+DDS_HEADER_SIZE = 128
+DDS_DX10_HEADER_SIZE = 20
+
+DDPF_ALPHAPIXELS = 0x1
+DDPF_FOURCC = 0x4
+DDPF_RGB = 0x40
+DDPF_LUMINANCE = 0x20000
+
+# DXGI formats mapped to (decoder name, bytes per block or pixel)
+DXGI_FORMATS = {
+    28: ('RGBA8', 4), 29: ('RGBA8', 4),
+    87: ('BGRA8', 4), 91: ('BGRA8', 4),
+    88: ('BGRX8', 4), 93: ('BGRX8', 4),
+    71: ('BC1', 8), 72: ('BC1', 8),
+    74: ('BC2', 16), 75: ('BC2', 16),
+    77: ('BC3', 16), 78: ('BC3', 16),
+    80: ('BC4', 8),
+    83: ('BC5', 16),
+    98: ('BC7', 16), 99: ('BC7', 16),
+}
+
+FOURCC_FORMATS = {
+    b'DXT1': ('BC1', 8),
+    b'DXT2': ('BC2', 16), b'DXT3': ('BC2', 16),
+    b'DXT4': ('BC3', 16), b'DXT5': ('BC3', 16),
+    b'ATI1': ('BC4', 8), b'BC4U': ('BC4', 8),
+    b'ATI2': ('BC5', 16), b'BC5U': ('BC5', 16),
+}
+
+BC7_WEIGHTS = {
+    2: np.array([0, 21, 43, 64], dtype=np.int32),
+    3: np.array([0, 9, 18, 27, 37, 46, 55, 64], dtype=np.int32),
+    4: np.array([0, 4, 9, 13, 17, 21, 26, 30, 34, 38, 43, 47, 51, 55, 60, 64], dtype=np.int32),
+}
+
+_BC7_PARTITION2_MASKS = np.array([
+    0xcccc, 0x8888, 0xeeee, 0xecc8, 0xc880, 0xfeec, 0xfec8, 0xec80,
+    0xc800, 0xffec, 0xfe80, 0xe800, 0xffe8, 0xff00, 0xfff0, 0xf000,
+    0xf710, 0x008e, 0x7100, 0x08ce, 0x008c, 0x7310, 0x3100, 0x8cce,
+    0x088c, 0x3110, 0x6666, 0x366c, 0x17e8, 0x0ff0, 0x718e, 0x399c,
+    0xaaaa, 0xf0f0, 0x5a5a, 0x33cc, 0x3c3c, 0x55aa, 0x9696, 0xa55a,
+    0x73ce, 0x13c8, 0x324c, 0x3bdc, 0x6996, 0xc33c, 0x9966, 0x0660,
+    0x0272, 0x04e4, 0x4e40, 0x2720, 0xc936, 0x936c, 0x39c6, 0x639c,
+    0x9336, 0x9cc6, 0x817e, 0xe718, 0xccf0, 0x0fcc, 0x7744, 0xee22,
+], dtype=np.uint32)
+"""2-subset partitions as 16-bit masks with a bit set for pixels of the second subset"""
+BC7_PARTITIONS2 = ((_BC7_PARTITION2_MASKS[:, None] >> np.arange(16)) & 1).astype(np.int32)
+"""Subset of each pixel for 2-subset partitions"""
+
+BC7_PARTITIONS3 = np.array([[int(c) for c in p] for p in (
+    '0011001102212222', '0001001122112221', '0000200122112211', '0222002200110111',
+    '0000000011221122', '0011001100220022', '0022002211111111', '0011001122112211',
+    '0000000011112222', '0000111111112222', '0000111122222222', '0012001200120012',
+    '0112011201120112', '0122012201220122', '0011011211221222', '0011200122002220',
+    '0001001101121122', '0111001120012200', '0000112211221122', '0022002200221111',
+    '0111011102220222', '0001000122212221', '0000001101220122', '0000110022102210',
+    '0122012200110000', '0012001211222222', '0110122112210110', '0000011012211221',
+    '0022110211020022', '0110011020022222', '0011012201220011', '0000200022112221',
+    '0000000211221222', '0222002200120011', '0011001200220222', '0120012001200120',
+    '0000111122220000', '0120120120120120', '0120201212010120', '0011220011220011',
+    '0011112222000011', '0101010122222222', '0000000021212121', '0022112200221122',
+    '0022001100220011', '0220122102201221', '0101222222220101', '0000212121212121',
+    '0101010101012222', '0222011102220111', '0002111200021112', '0000211221122112',
+    '0222011101110222', '0002111211120002', '0110011001102222', '0000000021122112',
+    '0110011022222222', '0022001100110022', '0022112211220022', '0000000000002112',
+    '0002000100020001', '0222122202221222', '0101222222222222', '0111201122012220',
+)], dtype=np.int32)
+"""Subset of each pixel for 3-subset partitions"""
+
+BC7_ANCHORS2 = np.array([
+    15, 15, 15, 15, 15, 15, 15, 15, 15, 15, 15, 15, 15, 15, 15, 15,
+    15,  2,  8,  2,  2,  8,  8, 15,  2,  8,  2,  2,  8,  8,  2,  2,
+    15, 15,  6,  8,  2,  8, 15, 15,  2,  8,  2,  2,  2, 15, 15,  6,
+     6,  2,  6,  8, 15, 15,  2,  2, 15, 15, 15, 15, 15,  2,  2, 15,
+], dtype=np.int32)
+"""Anchor pixel of the second subset for 2-subset partitions"""
+
+BC7_ANCHORS3 = np.array([[
+     3,  3, 15, 15,  8,  3, 15, 15,  8,  8,  6,  6,  6,  5,  3,  3,
+     3,  3,  8, 15,  3,  3,  6, 10,  5,  8,  8,  6,  8,  5, 15, 15,
+     8, 15,  3,  5,  6, 10,  8, 15, 15,  3, 15,  5, 15, 15, 15, 15,
+     3, 15,  5,  5,  5,  8,  5, 10,  5, 10,  8, 13, 15, 12,  3,  3,
+], [
+    15,  8,  8,  3, 15, 15,  3,  8, 15, 15, 15, 15, 15, 15, 15,  8,
+    15,  8, 15,  3, 15,  8, 15,  8,  3, 15,  6, 10, 15, 15, 10,  8,
+    15,  3, 15, 10, 10,  8,  9, 10,  6, 15,  8, 15,  3,  6,  6,  8,
+    15,  3, 15, 15, 15, 15, 15, 15, 15, 15, 15, 15,  3, 15, 15,  8,
+]], dtype=np.int32).T
+"""Anchor pixels of the second and third subset for 3-subset partitions"""
+
+# BC7 modes with partitions mapped to (subsets, partition bits, color bits, alpha bits, p-bits per 'endpoint'/'subset'/None, index bits)
+BC7_PARTITIONED_MODES = {
+    0: (3, 4, 4, 0, 'endpoint', 3),
+    1: (2, 6, 6, 0, 'subset', 3),
+    2: (3, 6, 5, 0, None, 2),
+    3: (2, 6, 7, 0, 'endpoint', 2),
+    7: (2, 6, 5, 5, 'endpoint', 2),
+}
+
+class DDSUnsupportedError(ValueError):
+    """Raised for DDS files or block modes this decoder can't handle."""
+
+
+def _blocks_to_image(blocks: np.ndarray, width: int, height: int) -> np.ndarray:
+    """Arrange (N, 16, 4) decoded 4x4 blocks into a (height, width, 4) image."""
+    bw, bh = (width+3) // 4, (height+3) // 4
+    image = blocks.reshape(bh, bw, 4, 4, 4).transpose(0, 2, 1, 3, 4).reshape(bh*4, bw*4, 4)
+    return image[:height, :width]
+
+def _expand(value: np.ndarray, bits: int) -> np.ndarray:
+    """Expand 'bits' wide values to 8 bits by replicating their top bits."""
+    return (value << (8-bits)) | (value >> (2*bits-8))
+
+def _decode_bc1_colors(blocks: np.ndarray, force_4colors=False) -> np.ndarray:
+    """Decode (N, 8) BC1 color blocks into (N, 16, 4) RGBA."""
+    c = blocks[:, :4].copy().view('<u2').astype(np.int32)
+    c0, c1 = c[:, 0], c[:, 1]
+    palette = np.zeros((len(blocks), 4, 4), dtype=np.int32)
+    for i, col in enumerate((c0, c1)):
+        palette[:, i, 0] = _expand((col >> 11) & 0x1f, 5)
+        palette[:, i, 1] = _expand((col >> 5) & 0x3f, 6)
+        palette[:, i, 2] = _expand(col & 0x1f, 5)
+    palette[:, :, 3] = 255
+
+    p0, p1 = palette[:, 0, :3], palette[:, 1, :3]
+    four = (c0 > c1)[:, None] | force_4colors
+    palette[:, 2, :3] = np.where(four, (2*p0 + p1 + 1) // 3, (p0 + p1) // 2)
+    palette[:, 3, :3] = np.where(four, (p0 + 2*p1 + 1) // 3, 0)
+    palette[:, 3, 3] = np.where(four[:, 0], 255, 0)
+
+    indices = blocks[:, 4:8].copy().view('<u4').astype(np.int64)
+    indices = (indices >> (2*np.arange(16))) & 0x3
+    return np.take_along_axis(palette, indices[:, :, None], axis=1)
+
+def _decode_bc3_alpha(blocks: np.ndarray) -> np.ndarray:
+    """Decode (N, 8) BC3/BC4 single channel blocks into (N, 16) values."""
+    a0, a1 = blocks[:, 0].astype(np.int32), blocks[:, 1].astype(np.int32)
+    palette = np.zeros((len(blocks), 8), dtype=np.int32)
+    palette[:, 0], palette[:, 1] = a0, a1
+    eight = a0 > a1
+    for k in range(1, 7):
+        palette[:, k+1] = np.where(eight, ((7-k)*a0 + k*a1 + 3) // 7, 0)
+    for k in range(1, 5):
+        palette[:, k+1] = np.where(eight, palette[:, k+1], ((5-k)*a0 + k*a1 + 2) // 5)
+    palette[:, 7] = np.where(eight, palette[:, 7], 255)
+
+    bits = np.zeros(len(blocks), dtype=np.uint64)
+    for i in range(6):
+        bits |= blocks[:, 2+i].astype(np.uint64) << np.uint64(8*i)
+    indices = ((bits[:, None] >> (3*np.arange(16, dtype=np.uint64))) & np.uint64(0x7)).astype(np.int64)
+    return np.take_along_axis(palette, indices, axis=1)
+
+def _bits(bits: np.ndarray, start: int, count: int) -> np.ndarray:
+    """Read 'count' bits wide field at 'start' of (N, 128) unpacked blocks."""
+    return (bits[:, start:start+count].astype(np.int32) << np.arange(count)).sum(axis=1)
+
+def _bc7_indices(bits: np.ndarray, start: int, count: int) -> np.ndarray:
+    """Read 16 'count' bits wide indices at 'start', the first (anchor) one being 1 bit shorter."""
+    indices = np.empty((len(bits), 16), dtype=np.int32)
+    indices[:, 0] = _bits(bits, start, count-1)
+    rest = bits[:, start+count-1:start+count-1+15*count].astype(np.int32).reshape(-1, 15, count)
+    indices[:, 1:] = (rest << np.arange(count)).sum(axis=2)
+    return indices
+
+def _bc7_interpolate(e0: np.ndarray, e1: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """Interpolate (N, C) endpoints by (N, 16) weights into (N, 16, C)."""
+    w = weights[:, :, None]
+    return ((64 - w) * e0[:, None, :] + w * e1[:, None, :] + 32) >> 6
+
+def _bc7_rotate(rgba: np.ndarray, rotation: np.ndarray):
+    """Swap alpha with a color channel picked by block's rotation bits, in place."""
+    for r in range(1, 4):
+        sel = rotation == r
+        rgba[sel, :, r-1], rgba[sel, :, 3] = rgba[sel, :, 3], rgba[sel, :, r-1].copy()
+
+def _decode_bc7_partitioned(bits: np.ndarray, mode: int) -> np.ndarray:
+    """Decode (N, 128) unpacked BC7 blocks of a mode with 2 or 3 subsets into (N, 16, 4) RGBA."""
+    num_subsets, partition_bits, color_bits, alpha_bits, pbits, index_bits = BC7_PARTITIONED_MODES[mode]
+    num_blocks = len(bits)
+    pos = mode + 1
+    partition = _bits(bits, pos, partition_bits)
+    pos += partition_bits
+
+    # endpoints are stored channel by channel, 2 per subset
+    num_endpoints = 2 * num_subsets
+    channels = 4 if alpha_bits else 3
+    endpoints = np.full((num_blocks, num_endpoints, 4), 255, dtype=np.int32)
+    for c in range(channels):
+        size = alpha_bits if c == 3 else color_bits
+        for e in range(num_endpoints):
+            endpoints[:, e, c] = _bits(bits, pos, size)
+            pos += size
+
+    if pbits:
+        num_pbits = num_endpoints if pbits == 'endpoint' else num_subsets
+        p = np.stack([_bits(bits, pos + i, 1) for i in range(num_pbits)], axis=1)
+        pos += num_pbits
+        if pbits == 'subset':
+            p = np.repeat(p, 2, axis=1)
+        endpoints[:, :, :channels] = (endpoints[:, :, :channels] << 1) | p[:, :, None]
+    for c in range(channels):
+        size = (alpha_bits if c == 3 else color_bits) + bool(pbits)
+        endpoints[:, :, c] = _expand(endpoints[:, :, c], size)
+
+    if num_subsets == 2:
+        subsets = BC7_PARTITIONS2[partition]
+        anchors = np.stack([np.zeros(num_blocks, dtype=np.int32), BC7_ANCHORS2[partition]], axis=1)
+    else:
+        subsets = BC7_PARTITIONS3[partition]
+        anchors = np.concatenate([np.zeros((num_blocks, 1), dtype=np.int32), BC7_ANCHORS3[partition]], axis=1)
+
+    # anchor pixels' indices are 1 bit shorter, so positions of indices differ per block
+    is_anchor = (np.arange(16)[None, :, None] == anchors[:, None, :]).any(axis=2)
+    widths = index_bits - is_anchor
+    starts = pos + np.cumsum(widths, axis=1) - widths
+    rows = np.arange(num_blocks)[:, None]
+    indices = np.zeros((num_blocks, 16), dtype=np.int32)
+    for k in range(index_bits):
+        bit = bits[rows, np.minimum(starts + k, 127)].astype(np.int32)
+        indices |= np.where(k < widths, bit, 0) << k
+
+    e0 = np.take_along_axis(endpoints, (2 * subsets)[:, :, None], axis=1)
+    e1 = np.take_along_axis(endpoints, (2 * subsets + 1)[:, :, None], axis=1)
+    w = BC7_WEIGHTS[index_bits][indices][:, :, None]
+    return ((64 - w) * e0 + w * e1 + 32) >> 6
+
+def _decode_bc7(blocks: np.ndarray) -> np.ndarray:
+    """Decode (N, 16) BC7 blocks into (N, 16, 4) RGBA."""
+    bits = np.unpackbits(blocks, axis=1, bitorder='little')
+    # mode is the position of the first set bit, blocks with none are reserved and decode to transparent black
+    modes = np.where(bits[:, :8].any(axis=1), bits[:, :8].argmax(axis=1), 8)
+
+    rgba = np.zeros((len(blocks), 16, 4), dtype=np.int32)
+
+    for mode in BC7_PARTITIONED_MODES:
+        sel = modes == mode
+        if sel.any():
+            rgba[sel] = _decode_bc7_partitioned(bits[sel], mode)
+
+    sel = modes == 6
+    if sel.any():
+        b = bits[sel]
+        ep = [_bits(b, 7 + 7*i, 7) for i in range(8)]
+        p0, p1 = _bits(b, 63, 1), _bits(b, 64, 1)
+        e0 = np.stack([(ep[i] << 1) | p0 for i in range(0, 8, 2)], axis=1)
+        e1 = np.stack([(ep[i] << 1) | p1 for i in range(1, 8, 2)], axis=1)
+        rgba[sel] = _bc7_interpolate(e0, e1, BC7_WEIGHTS[4][_bc7_indices(b, 65, 4)])
+
+    sel = modes == 5
+    if sel.any():
+        b = bits[sel]
+        ep = [_expand(_bits(b, 8 + 7*i, 7), 7) for i in range(6)]
+        a0, a1 = _bits(b, 50, 8), _bits(b, 58, 8)
+        color = _bc7_interpolate(np.stack(ep[0::2], axis=1), np.stack(ep[1::2], axis=1), BC7_WEIGHTS[2][_bc7_indices(b, 66, 2)])
+        alpha = _bc7_interpolate(a0[:, None], a1[:, None], BC7_WEIGHTS[2][_bc7_indices(b, 97, 2)])
+        block = np.concatenate((color, alpha), axis=2)
+        _bc7_rotate(block, _bits(b, 6, 2))
+        rgba[sel] = block
+
+    sel = modes == 4
+    if sel.any():
+        b = bits[sel]
+        ep = [_expand(_bits(b, 8 + 5*i, 5), 5) for i in range(6)]
+        a0, a1 = _expand(_bits(b, 38, 6), 6), _expand(_bits(b, 44, 6), 6)
+        w2 = BC7_WEIGHTS[2][_bc7_indices(b, 50, 2)]
+        w3 = BC7_WEIGHTS[3][_bc7_indices(b, 81, 3)]
+        # index mode bit picks which index set is used for color and which for alpha
+        swap = _bits(b, 7, 1).astype(bool)[:, None]
+        color = _bc7_interpolate(np.stack(ep[0::2], axis=1), np.stack(ep[1::2], axis=1), np.where(swap, w3, w2))
+        alpha = _bc7_interpolate(a0[:, None], a1[:, None], np.where(swap, w2, w3))
+        block = np.concatenate((color, alpha), axis=2)
+        _bc7_rotate(block, _bits(b, 5, 2))
+        rgba[sel] = block
+
+    return rgba
+
+def _decode_masked(data: np.ndarray, bit_count: int, masks: tuple[int, int, int, int], width: int, height: int) -> np.ndarray:
+    """Decode uncompressed pixels described by legacy RGBA bit masks."""
+    size = bit_count // 8
+    raw = data[:width*height*size].reshape(-1, size).astype(np.uint32)
+    pixels = np.zeros(len(raw), dtype=np.uint32)
+    for i in range(size):
+        pixels |= raw[:, i] << np.uint32(8*i)
+
+    rgba = np.full((len(raw), 4), 255, dtype=np.int32)
+    for c, mask in enumerate(masks):
+        if not mask:
+            continue
+        shift = (mask & -mask).bit_length() - 1
+        max_value = mask >> shift
+        rgba[:, c] = ((pixels & np.uint32(mask)) >> np.uint32(shift)).astype(np.int64) * 255 // max_value
+    return rgba.reshape(height, width, 4)
+
+def decode(buffer) -> np.ndarray:
+    """Decode top mip level of a DDS file held in 'buffer' into (height, width, 4) uint8 RGBA, top row first."""
+    if bytes(buffer[:4]) != DDS_MAGIC:
+        raise DDSUnsupportedError("Not a DDS file!")
+    if len(buffer) < DDS_HEADER_SIZE:
+        raise DDSUnsupportedError("DDS header is truncated")
+
+    height, width = unpack_from('<2I', buffer, 12)
+    pf_flags, fourcc, bit_count = unpack_from('<I4sI', buffer, 80)
+    masks = unpack_from('<4I', buffer, 92)
+    if not width or not height:
+        raise DDSUnsupportedError("DDS texture has no pixels")
+    offset = DDS_HEADER_SIZE
+
+    fmt = None
+    if pf_flags & DDPF_FOURCC:
+        if fourcc == b'DX10':
+            if len(buffer) < DDS_HEADER_SIZE + DDS_DX10_HEADER_SIZE:
+                raise DDSUnsupportedError("DDS header is truncated")
+            dxgi_format = unpack_from('<I', buffer, DDS_HEADER_SIZE)[0]
+            offset += DDS_DX10_HEADER_SIZE
+            fmt = DXGI_FORMATS.get(dxgi_format)
+            if not fmt:
+                raise DDSUnsupportedError(f"DXGI format {dxgi_format} is not supported")
+        else:
+            fmt = FOURCC_FORMATS.get(fourcc)
+            if not fmt:
+                raise DDSUnsupportedError(f"FourCC {fourcc} is not supported")
+    elif not pf_flags & (DDPF_RGB | DDPF_LUMINANCE) or bit_count not in (8, 16, 24, 32):
+        raise DDSUnsupportedError(f"Pixel format with flags {hex(pf_flags)} is not supported")
+
+    data = np.frombuffer(buffer, dtype=np.uint8, offset=offset)
+
+    # legacy uncompressed formats
+    if fmt is None:
+        if len(data) < width*height*(bit_count // 8):
+            raise DDSUnsupportedError("DDS file is truncated")
+        if not pf_flags & DDPF_ALPHAPIXELS:
+            masks = masks[:3] + (0,)
+        if pf_flags & DDPF_LUMINANCE:
+            masks = (masks[0], masks[0], masks[0], masks[3])
+        return _decode_masked(data, bit_count, masks, width, height).astype(np.uint8)
+
+    name, size = fmt
+    if name in ('RGBA8', 'BGRA8', 'BGRX8'):
+        if len(data) < width*height*4:
+            raise DDSUnsupportedError("DDS file is truncated")
+        rgba = data[:width*height*4].reshape(height, width, 4).copy()
+        if name != 'RGBA8':
+            rgba[:, :, [0, 2]] = rgba[:, :, [2, 0]]
+        if name == 'BGRX8':
+            rgba[:, :, 3] = 255
+        return rgba
+
+    num_blocks = ((width+3) // 4) * ((height+3) // 4)
+    if len(data) < num_blocks*size:
+        raise DDSUnsupportedError("DDS file is truncated")
+    blocks = data[:num_blocks*size].reshape(num_blocks, size)
+
+    if name == 'BC1':
+        rgba = _decode_bc1_colors(blocks)
+    elif name == 'BC2':
+        rgba = _decode_bc1_colors(blocks[:, 8:], force_4colors=True)
+        alpha = np.unpackbits(blocks[:, :8], axis=1, bitorder='little').reshape(-1, 16, 4)
+        rgba[:, :, 3] = _expand((alpha.astype(np.int32) << np.arange(4)).sum(axis=2), 4)
+    elif name == 'BC3':
+        rgba = _decode_bc1_colors(blocks[:, 8:], force_4colors=True)
+        rgba[:, :, 3] = _decode_bc3_alpha(blocks[:, :8])
+    elif name == 'BC4':
+        rgba = np.zeros((num_blocks, 16, 4), dtype=np.int32)
+        rgba[:, :, 0] = _decode_bc3_alpha(blocks)
+        rgba[:, :, 3] = 255
+    elif name == 'BC5':
+        rgba = np.zeros((num_blocks, 16, 4), dtype=np.int32)
+        rgba[:, :, 0] = _decode_bc3_alpha(blocks[:, :8])
+        rgba[:, :, 1] = _decode_bc3_alpha(blocks[:, 8:])
+        rgba[:, :, 3] = 255
+    else:
+        rgba = _decode_bc7(blocks)
+
+    return _blocks_to_image(rgba, width, height).astype(np.uint8)
+
+def load(filepath) -> np.ndarray:
+    """Decode DDS file at 'filepath' into (height, width, 4) uint8 RGBA, top row first."""
+    with open(filepath, 'rb') as f:
+        return decode(f.read())
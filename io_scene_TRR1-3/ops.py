@@ -1,6 +1,7 @@
 import bpy, bmesh, os, pathlib
 from . import utils as trm_utils
 from . import pdp_utils
+from . import trm_cache
 
 class TR123R_OT_CreateShader(bpy.types.Operator):
     bl_idname = "io_tombraider123r.create_shader"
@@ -141,6 +142,13 @@ class TR123R_OT_GenerateSkeletonData(bpy.types.Operator):
     bl_label = "Generate Skeleton Data"
     bl_description = "Generates Bone data inside addon's directory, for each model in the game based on .PHD files from DATA folders.\nRequires Game Directory to be provided."
 
+    rebuild: bpy.props.BoolProperty(
+        name="Rebuild",
+        description="Parse all .PDP files again, instead of only the ones changed since the last generation",
+        default=False,
+        options={'SKIP_SAVE'}
+    )
+
     op_result = None
     op_result_msg = []
 
@@ -170,10 +178,11 @@ class TR123R_OT_GenerateSkeletonData(bpy.types.Operator):
             self.op_result_msg = ["ERROR: Wrong Game Directory!", "Couldn't find .PDP files in DATA folders."]
             return self.op_result
         
-        pdp_utils.xml_write_skeleton(game_path)
+        num_parsed, num_pdps = pdp_utils.xml_write_skeleton(game_path, self.rebuild)
+        pdp_utils.clear_pdp_cache()
 
         self.op_result = {"FINISHED"}
-        self.op_result_msg = ["Success!", "Skeleton Data generated successfully.", "TRMs can create armatures now.", "NOTE: WIP - for now only Lara meshes are supported!"]
+        self.op_result_msg = ["Success!", "Skeleton Data generated successfully.", f"Parsed all {num_pdps} .PDP files." if self.rebuild else f"Parsed {num_parsed} of {num_pdps} .PDP files, others were unchanged.", "TRMs can create armatures now.", "NOTE: WIP - for now only Lara meshes are supported!"]
         return self.op_result
     
     def invoke(self, context, event):
@@ -196,9 +205,21 @@ class TR123R_OT_GenerateSkeletonData(bpy.types.Operator):
             row = col.row()
             row.label(text=line)
     
+class TR123R_OT_ClearTRMCache(bpy.types.Operator):
+    bl_idname = "io_tombraider123r.clear_trm_cache"
+    bl_label = "Clear TRM Cache"
+    bl_description = "Remove decoded TRM data cached in addon's directory by imports with \"Use Cache\" enabled"
+
+    def execute(self, context):
+        cache_dir = os.path.join(os.path.dirname(__file__), trm_cache.TRM_CACHE_DIRPATH)
+        trm_cache.TRMCache(cache_dir).clear()
+        self.report({'INFO'}, "TRM Cache cleared.")
+        return {"FINISHED"}
+    
 cls = (
     TR123R_OT_CreateShader,
     TR123R_OT_UV_QuantizeVerts,
-    TR123R_OT_GenerateSkeletonData
+    TR123R_OT_GenerateSkeletonData,
+    TR123R_OT_ClearTRMCache
 )
 _register, _unregister = bpy.utils.register_classes_factory(cls)
\ No newline at end of file
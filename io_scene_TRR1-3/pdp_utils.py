@@ -1,114 +1,323 @@
-import bpy, os
+import bpy, os, json, hashlib, threading
+import numpy as np
 import xml.etree.ElementTree as ET
-from struct import unpack
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from . import bin_parse
+from typing import NamedTuple
+from . import bin_parse, skeleton_data
 
 TR_ENTITY_NAMES_FILEPATH = "lib/TRM_Names.xml"
 SKELETON_DATA_FILEPATH = "lib_user/SkeletonData.xml"
-
-def process_pdp(filepath):
+SKELETON_DATA_NPZ_FILEPATH = "lib_user/SkeletonData.npz"
+"""Compact copy of Skeleton Data read by the importer, the XML is kept as a readable view"""
+PDP_MANIFEST_FILEPATH = "lib_user/PDPManifest.json"
+PDP_MANIFEST_VERSION = 2
+"""Bump whenever stored models change to make the next generation reparse all PDPs"""
+
+PDP_GAME_SUBDIRS = {
+    1: ['DATA', 'DATA/UB'],
+    2: ['DATA', 'DATA/GM'],
+    3: ['DATA', 'DATA/LA', 'CUTS']
+}
+"""Folders with PDP files of each game, in lookup order"""
+
+PDP_MODEL_DTYPE = np.dtype([
+    ('ID', '<u4'),
+    ('num_meshes', '<u2'),
+    ('starting_mesh', '<u2'),
+    ('mesh_tree', '<u4'),
+    ('frame_offset', '<u4'),
+    ('animation', '<u2'),
+])
+"""18 bytes model entry of PDP's models table"""
+
+class PDPModels(NamedTuple):
+    """Skeletal models of a PDP file and mesh trees they point to"""
+    models: np.ndarray
+    """Structured array of PDP_MODEL_DTYPE"""
+    meshtrees: np.ndarray
+    """int32 mesh tree entries, 4 per model's mesh after the first one, indexed by models' 'mesh_tree' field"""
+
+def process_pdp(filepath) -> PDPModels:
     with open(filepath, 'rb') as f:
-       
-        num_animations =  bin_parse.read_uint32(f)
-        f.seek(num_animations * 32, 1)
-
-        num_statechanges =  bin_parse.read_uint32(f)
-        f.seek(num_statechanges * 6, 1)
-
-        num_animdispatches =  bin_parse.read_uint32(f)
-        f.seek(num_animdispatches * 8, 1)
-
-        num_animcommands =  bin_parse.read_uint32(f)
-        f.seek(num_animcommands * 2, 1)
-
-        num_meshtrees =  bin_parse.read_uint32(f)
-        # KEEP MESH TREES
-        meshtrees = []
-        for n in range(num_meshtrees):
-            meshtrees.append(bin_parse.read_int32(f))
-
-        num_frames =  bin_parse.read_uint32(f)
-        f.seek(num_frames * 2, 1)
-
-        num_models =  bin_parse.read_uint32(f)
-        # KEEP MODELS
-        models: list[dict] = []
-        for n in range(num_models):
-            d = unpack('<IHHIIH', f.read(18))
-            model = {'ID': d[0], 'num_meshes': d[1], 'starting_mesh': d[2], 'mesh_tree': d[3], 'frame_offset': d[4], 'animation': d[5]}
-            # Get only skeletal meshes
-            if model['num_meshes'] > 1:
-                meshtree_size = model['mesh_tree']+(4*model['num_meshes'])
-                model['trees'] = meshtrees[model['mesh_tree']:meshtree_size+1]
-                models.append(model)
+        reader = bin_parse.BinReader(f.read())
 
-    return models
+    # skip animations, state changes, anim dispatches and anim commands
+    for item_size in (32, 6, 8, 2):
+        reader.seek(reader.read_uint32() * item_size, 1)
+
+    # KEEP MESH TREES
+    num_meshtrees = reader.read_uint32()
+    meshtrees = reader.read_array('<i4', num_meshtrees)
+
+    num_frames = reader.read_uint32()
+    reader.seek(num_frames * 2, 1)
+
+    # KEEP MODELS
+    num_models = reader.read_uint32()
+    models = reader.read_array(PDP_MODEL_DTYPE, num_models)
+
+    # Get only skeletal meshes, with their mesh trees packed one after another
+    models = models[models['num_meshes'] > 1].copy()
+    tree_sizes = 4 * (models['num_meshes'].astype(np.int64) - 1)
+    tree_starts = np.repeat(models['mesh_tree'].astype(np.int64) - np.cumsum(tree_sizes) + tree_sizes, tree_sizes)
+    tree_ids = tree_starts + np.arange(tree_sizes.sum())
+    models['mesh_tree'] = np.cumsum(tree_sizes) - tree_sizes
+
+    return PDPModels(models, meshtrees[tree_ids])
+
+def models_to_json(models:PDPModels) -> dict:
+    return {'table': models.models.tolist(), 'meshtrees': models.meshtrees.tolist()}
+
+def models_from_json(data:dict) -> PDPModels:
+    table = np.array([tuple(m) for m in data['table']], dtype=PDP_MODEL_DTYPE)
+    return PDPModels(table, np.array(data['meshtrees'], dtype=np.int32))
 
-def get_game_models(game_dir, game_id=1, game_subdirs=['DATA']):
-    game_models: list[dict] = []
-    gm_ids = set()
-    # filepath = os.path.abspath(os.path.join(game_dir, f'{game_id}/DATA/EMPRTOMB.PDP'))
+def file_hash(filepath) -> str:
+    h = hashlib.sha1()
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024**2), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+class PDPManifest:
+    """Models extracted from each PDP file along with its size, modification time and hash,
+    so unchanged files don't have to be parsed again"""
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.entries: dict[str, dict] = {}
+        self.names_mtime = 0
+        self.parsed = 0
+        self.changed = False
+        self.seen = set()
+        self._lock = threading.Lock()
+        try:
+            with open(filepath, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == PDP_MANIFEST_VERSION:
+                self.entries = data['files']
+                self.names_mtime = data['names_mtime']
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def get_models(self, filepath) -> PDPModels:
+        """Models of PDP file, parsed only if it's new or changed since the last generation.\n
+        Safe to call from multiple threads."""
+        key = os.path.abspath(filepath)
+        stat = os.stat(key)
+        with self._lock:
+            self.seen.add(key)
+            entry = self.entries.get(key)
+        if entry and entry['size'] == stat.st_size:
+            if entry['mtime'] == stat.st_mtime_ns:
+                return models_from_json(entry['models'])
+            # touched but possibly unchanged file, compare contents
+            sha1 = file_hash(key)
+            if entry['sha1'] == sha1:
+                with self._lock:
+                    entry['mtime'] = stat.st_mtime_ns
+                    self.changed = True
+                return models_from_json(entry['models'])
+        else:
+            sha1 = file_hash(key)
+
+        models = process_pdp(key)
+        with self._lock:
+            self.entries[key] = {'size': stat.st_size, 'mtime': stat.st_mtime_ns, 'sha1': sha1, 'models': models_to_json(models)}
+            self.parsed += 1
+            self.changed = True
+        return models
+
+    def set_names_mtime(self, mtime):
+        if mtime != self.names_mtime:
+            self.names_mtime = mtime
+            self.changed = True
+
+    def prune(self):
+        """Drop entries of PDP files not seen during this generation"""
+        for key in set(self.entries) - self.seen:
+            del self.entries[key]
+            self.changed = True
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.filepath), exist_ok=True)
+        with open(self.filepath, 'w', encoding='utf-8') as f:
+            json.dump({'version': PDP_MANIFEST_VERSION, 'names_mtime': self.names_mtime, 'files': self.entries}, f)
+
+def get_game_pdps(game_dir, game_id=1, game_subdirs=['DATA']) -> list[str]:
+    """PDP files of a game, in subdirectories order and sorted by name within each of them"""
+    files = []
     for subdir in game_subdirs:
         file_dir = os.path.abspath(os.path.join(game_dir, f'{game_id}/{subdir}'))
-        files = Path(file_dir).glob('*.PDP')
-        for filepath in files:
-            models = process_pdp(filepath)
-            # filter out duplicate models by ID
-            for model in models:
-                if model['ID'] not in gm_ids:
-                    game_models.append(model)
-                    gm_ids.add(model['ID'])
-
-    game_models.sort(key=lambda gm: gm['ID'])
-    return game_models
-
-def get_bone_data(model) -> list:
-    bones = [[-1, (0, 0, 0)]]
+        files.extend(sorted(str(p) for p in Path(file_dir).glob('*.PDP')))
+    return files
+
+def merge_models(pdp_models) -> PDPModels:
+    """Merge models of PDP files into a table sorted by ID, keeping the first model found for each ID"""
+    pdp_models = list(pdp_models)
+    if not pdp_models:
+        return PDPModels(np.empty(0, dtype=PDP_MODEL_DTYPE), np.empty(0, dtype=np.int32))
+
+    models = np.concatenate([m.models for m in pdp_models])
+    # point mesh trees of each file's models into concatenated mesh trees
+    tree_offsets = np.cumsum([0] + [len(m.meshtrees) for m in pdp_models[:-1]]).astype(np.uint32)
+    models['mesh_tree'] += np.repeat(tree_offsets, [len(m.models) for m in pdp_models])
+    meshtrees = np.concatenate([m.meshtrees for m in pdp_models])
+
+    # filter out duplicate models by ID, np.unique gives index of the first one sorted by ID
+    _, first = np.unique(models['ID'], return_index=True)
+    return PDPModels(models[first], meshtrees)
+
+def parse_game_pdps(game_dir, game_id=1, game_subdirs=['DATA'], manifest:PDPManifest=None, pool:ThreadPoolExecutor=None):
+    """Iterator of models of each PDP file of a game, in files order. When 'pool' is given,
+    all files are submitted to it right away and parsed concurrently."""
+    files = get_game_pdps(game_dir, game_id, game_subdirs)
+    load = manifest.get_models if manifest else process_pdp
+    return pool.map(load, files) if pool else map(load, files)
+
+def get_game_models(game_dir, game_id=1, game_subdirs=['DATA'], manifest:PDPManifest=None, pool:ThreadPoolExecutor=None):
+    """Models of all PDP files of a game. PDPs are parsed concurrently when 'pool' is given,
+    the result doesn't depend on which file finishes first."""
+    return merge_models(parse_game_pdps(game_dir, game_id, game_subdirs, manifest, pool))
+
+def get_bone_hierarchy(model, meshtrees:np.ndarray) -> tuple[list[int], list[tuple], list[list[int]]]:
+    """Resolve mesh tree of a model record from PDPModels table in a single pass.\n
+    Returns tuple[parent ID of each bone, head of each bone, children IDs of each bone in ascending order]"""
+    parents = [-1]
+    heads = [(0, 0, 0)]
+    children = [[]]
     stack = [0, 0]
-    meshtrees = model['trees']
-    tree = 0
-
-    for n in range(1, model['num_meshes']):
-        flags = meshtrees[tree]
-        x = meshtrees[tree+1]
-        y = meshtrees[tree+2]
-        z = meshtrees[tree+3]
+    start = int(model['mesh_tree'])
+    num_meshes = int(model['num_meshes'])
+    trees = meshtrees[start:start + 4*(num_meshes-1)].reshape(-1, 4).tolist()
 
+    for n, (flags, x, y, z) in enumerate(trees, 1):
         previous = stack.pop()
         if flags & 0x01:
             previous = stack.pop()
 
-        bones.append([previous, (x, y, z)])
+        parents.append(previous)
+        heads.append((x, y, z))
+        children.append([])
+        children[previous].append(n)
 
         if flags & 0x02:
             stack.append(previous)
         stack.append(n)
 
-        tree += 4
-
-    # loop through bones and show thier parent ID, head and tail (assumed) coords
-    model['bones'] = []
-    for p in range(len(bones)):
-        children = 0
-        child = -1
-        # loop through all the next bones in the list and count them as children when their parent ID matches current ID
-        for c in range(p + 1, len(bones)):
-            if bones[c][0] == p:
-                children += 1
-                child = c
-                
-        bone_data = bones[p]
-        # guess and save bone's tail data according to last child bone under it (children == 1 would get first one)
-        if children > 0:
-            c = bones[child][1]
-            bone_data.append((c[0], c[1], c[2]))
+    return parents, heads, children
 
-        model['bones'].append(bone_data)
+def get_bone_data(model, meshtrees:np.ndarray) -> list:
+    """Bones of a model record from PDPModels table, as [parent ID, head(, tail)] lists"""
+    parents, heads, children = get_bone_hierarchy(model, meshtrees)
 
-    return model['bones']
+    bones_data = []
+    for p in range(len(parents)):
+        bone_data = [parents[p], heads[p]]
+        # guess and save bone's tail data according to last child bone under it (children == 1 would get first one)
+        if children[p]:
+            bone_data.append(heads[children[p][-1]])
+
+        bones_data.append(bone_data)
+
+    return bones_data
+
+def skeleton_from_model(game_id, model, meshtrees:np.ndarray, name="") -> skeleton_data.SkeletonArmature:
+    """Skeleton of a model record from PDPModels table, same as the one written to Skeleton Data"""
+    parents, heads, children = get_bone_hierarchy(model, meshtrees)
+    tails = [heads[c[-1]] if c else (0, 0, 0) for c in children]
+    return skeleton_data.SkeletonArmature(
+        int(game_id), int(model['ID']), name,
+        np.array(parents, dtype=np.int32),
+        np.array(heads, dtype=np.float32),
+        np.array(tails, dtype=np.float32),
+        np.array([bool(c) for c in children]),
+    )
+
+_pdp_models: dict[str, tuple[int, int, PDPModels]] = {}
+_skeletons: dict[tuple[str, int, int], skeleton_data.SkeletonArmature | None] = {}
+_pdp_lock = threading.Lock()
+
+def load_pdp_models(filepath) -> PDPModels:
+    """Models of PDP file, parsed once per session unless the file changes"""
+    key = os.path.abspath(filepath)
+    stat = os.stat(key)
+    with _pdp_lock:
+        cached = _pdp_models.get(key)
+    if cached and cached[:2] == (stat.st_size, stat.st_mtime_ns):
+        return cached[2]
+    models = process_pdp(key)
+    with _pdp_lock:
+        _pdp_models[key] = (stat.st_size, stat.st_mtime_ns, models)
+    return models
 
-def xml_write_skeleton(game_dir):
+def find_skeleton(game_dir, game_id, model_id, name="") -> skeleton_data.SkeletonArmature | None:
+    """Resolve skeleton of a single model straight from game's PDP files, without Skeleton Data.\n
+    PDPs are parsed in the same order as during generation only until the model is found,
+    results are memoized per session."""
+    game_id, model_id = int(game_id), int(model_id)
+    key = (os.path.abspath(game_dir), game_id, model_id)
+    with _pdp_lock:
+        if key in _skeletons:
+            return _skeletons[key]
+
+    skel = None
+    for filepath in get_game_pdps(game_dir, game_id, PDP_GAME_SUBDIRS.get(game_id, [])):
+        models = load_pdp_models(filepath)
+        found = np.flatnonzero(models.models['ID'] == model_id)
+        if found.size:
+            skel = skeleton_from_model(game_id, models.models[found[0]], models.meshtrees, name)
+            break
+
+    with _pdp_lock:
+        _skeletons[key] = skel
+    return skel
+
+def clear_pdp_cache():
+    """Forget PDP models and skeletons resolved during this session"""
+    with _pdp_lock:
+        _pdp_models.clear()
+        _skeletons.clear()
+
+class EntityNames:
+    """Entity names table of TRM_Names.xml, by (game ID, model ID) and by (game ID, name)"""
+    def __init__(self, filepath):
+        self.names: dict[tuple[int, int], str] = {}
+        self.ids: dict[tuple[int, str], int] = {}
+        root = ET.parse(filepath).getroot()
+        for game in root.iterfind('game'):
+            game_id = int(game.get('ID'))
+            for model in game.iterfind('model'):
+                model_id, name = int(model.findtext('ID')), model.findtext('name')
+                self.names.setdefault((game_id, model_id), name)
+                # names are matched regardless of case, as TRM filenames are mostly upper case
+                self.ids.setdefault((game_id, name.casefold()), model_id)
+
+    def get_name(self, game_id, model_id) -> str | None:
+        return self.names.get((int(game_id), int(model_id)))
+
+    def get_id(self, game_id, name:str) -> int | None:
+        return self.ids.get((int(game_id), name.casefold()))
+
+_entity_names: tuple[int, EntityNames] | None = None
+
+def get_entity_names() -> EntityNames:
+    """Entity names table, loaded once per session unless TRM_Names.xml changes"""
+    global _entity_names
+    filepath = os.path.join(os.path.dirname(__file__), TR_ENTITY_NAMES_FILEPATH)
+    mtime = os.stat(filepath).st_mtime_ns
+    with _pdp_lock:
+        if not _entity_names or _entity_names[0] != mtime:
+            _entity_names = (mtime, EntityNames(filepath))
+        return _entity_names[1]
+
+def get_model_id(game_id, name:str) -> int | None:
+    """Model ID of entity 'name' in TRM_Names.xml for the game"""
+    return get_entity_names().get_id(game_id, name)
+
+def xml_write_skeleton(game_dir, rebuild=False) -> tuple[int, int]:
+    """Write Skeleton Data of all games' models, reparsing only PDP files changed since the last generation
+    unless 'rebuild' is set. Returns tuple[parsed PDP files count, all PDP files count]"""
     # Example of the XML structure:
     #
     # <Models>
@@ -125,31 +334,43 @@ def xml_write_skeleton(game_dir):
 
     addon_dir = os.path.dirname(__file__)
 
-    game_subdirs = {
-        1: ['DATA', 'DATA/UB'],
-        2: ['DATA', 'DATA/GM'],
-        3: ['DATA', 'DATA/LA', 'CUTS']
-    }
+    game_subdirs = PDP_GAME_SUBDIRS
+
+    xml_filepath = os.path.join(addon_dir, SKELETON_DATA_FILEPATH)
+    npz_filepath = os.path.join(addon_dir, SKELETON_DATA_NPZ_FILEPATH)
+    manifest = PDPManifest(os.path.join(addon_dir, PDP_MANIFEST_FILEPATH))
+    if rebuild:
+        manifest.entries.clear()
 
     tr_entities_filepath = os.path.join(addon_dir, TR_ENTITY_NAMES_FILEPATH)
-    tr_entities_tree = ET.parse(tr_entities_filepath)
-    tr_entities_root = tr_entities_tree.getroot()
+    manifest.set_names_mtime(os.stat(tr_entities_filepath).st_mtime_ns)
+    # submit PDPs of all games at once, merging each game's models in files order afterwards
+    with ThreadPoolExecutor(min(8, os.cpu_count() or 1)) as pool:
+        game_pdps = {g_id: parse_game_pdps(game_dir, g_id, game_subdirs[g_id], manifest, pool) for g_id in range(1,4)}
+        game_models = {g_id: merge_models(pdp_models) for g_id, pdp_models in game_pdps.items()}
+    manifest.prune()
+
+    # nothing to merge, keep the existing XML
+    if not manifest.changed and os.path.exists(xml_filepath) and os.path.exists(npz_filepath):
+        return manifest.parsed, len(manifest.entries)
+
+    entity_names = get_entity_names()
     
+    armatures: list[skeleton_data.SkeletonArmature] = []
     data_root = ET.Element('Models')
     for g_id in range(1,4):
         data_game = ET.SubElement(data_root, 'Game')
         data_game.set('ID', f'{g_id}')
 
-        models = get_game_models(game_dir, g_id, game_subdirs[g_id])
-
-        for model in models:
-            skel = get_bone_data(model)
-            tr_entity = tr_entities_root.find("./game/[@ID='%s']/model/[ID='%s']/name" % (g_id, model['ID']))
-            model_name = tr_entity.text
+        models = game_models[g_id]
+        for model in models.models:
+            skel = get_bone_data(model, models.meshtrees)
+            model_name = entity_names.get_name(g_id, model['ID']) or f'{model["ID"]}'
 
             data_arm = ET.SubElement(data_game, 'Armature')
             data_arm.set('m_ID', f'{model["ID"]}')
             data_arm.set('name', model_name)
+            armatures.append(skeleton_from_model(g_id, model, models.meshtrees, model_name))
 
             for bone in skel:
                 elem_bone = ET.SubElement(data_arm, 'Bone')
@@ -172,5 +393,7 @@ def xml_write_skeleton(game_dir):
     if not os.path.exists(userlib_dir):
         os.makedirs(userlib_dir)
 
-    xml_filepath = os.path.join(addon_dir, SKELETON_DATA_FILEPATH)
-    tree.write(xml_filepath, encoding='utf-8', xml_declaration=True)
\ No newline at end of file
+    tree.write(xml_filepath, encoding='utf-8', xml_declaration=True)
+    skeleton_data.write_npz(npz_filepath, armatures)
+    manifest.save()
+    return manifest.parsed, len(manifest.entries)
\ No newline at end of file
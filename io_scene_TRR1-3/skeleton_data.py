@@ -0,0 +1,134 @@
+"""In-memory index of generated Skeleton Data.
+
+Skeleton Data is loaded once per session into armatures keyed by game ID and
+model name or ID, with bone vectors decoded into numpy arrays. The index is
+loaded again only when the file changes.
+
+Besides SkeletonData.xml, the data is stored in a compact .npz file: bones of
+all models concatenated into parent, head and tail arrays, with per-model
+offsets into them. Armatures loaded from it are views into these arrays.
+"""
+import numpy as np
+import os, threading
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass
+
+@dataclass
+class SkeletonArmature:
+    """Bones of a single model, in original order"""
+    game_id: int
+    model_id: int
+    name: str
+    parents: np.ndarray
+    """(N,) int32 parent bone index, -1 for the root"""
+    heads: np.ndarray
+    """(N, 3) float32 bone head offsets from parent's head, in game units"""
+    tails: np.ndarray
+    """(N, 3) float32 guessed tail offsets from bone's head, zero where there's none"""
+    has_tail: np.ndarray
+    """(N,) bool, True for bones having a tail"""
+
+    @property
+    def num_bones(self) -> int:
+        return len(self.parents)
+
+
+class SkeletonStore:
+    """Armatures of all games, by (game ID, model name) and (game ID, model ID)"""
+    def __init__(self):
+        self.by_name: dict[tuple[int, str], SkeletonArmature] = {}
+        self.by_id: dict[tuple[int, int], SkeletonArmature] = {}
+
+    def add(self, arm: SkeletonArmature):
+        # keep the first armature found for a name, like a lookup in the XML would
+        self.by_name.setdefault((arm.game_id, arm.name), arm)
+        self.by_id.setdefault((arm.game_id, arm.model_id), arm)
+
+    def get(self, game_id, name:str) -> SkeletonArmature | None:
+        return self.by_name.get((int(game_id), name))
+
+    def get_by_id(self, game_id, model_id) -> SkeletonArmature | None:
+        return self.by_id.get((int(game_id), int(model_id)))
+
+    def __len__(self):
+        return len(self.by_id)
+
+
+def parse_vector(text:str) -> tuple[float, float, float]:
+    """Decode "(x, y, z)" vector string written by pdp_utils.xml_write_skeleton"""
+    x, y, z = text.strip('() ').split(',')
+    return float(x), float(y), float(z)
+
+def write_npz(filepath, armatures:list[SkeletonArmature]):
+    """Store armatures in compact .npz format"""
+    num_bones = [arm.num_bones for arm in armatures]
+    arrays = {
+        'game_ids': np.array([arm.game_id for arm in armatures], dtype=np.uint8),
+        'model_ids': np.array([arm.model_id for arm in armatures], dtype=np.uint32),
+        'names': np.array([arm.name for arm in armatures], dtype=str),
+        'offsets': np.cumsum([0] + num_bones, dtype=np.uint32),
+    }
+    for field, dtype, shape in (('parents', np.int32, ()), ('heads', np.float32, (3,)), ('tails', np.float32, (3,)), ('has_tail', bool, ())):
+        values = [getattr(arm, field) for arm in armatures]
+        arrays[field] = np.concatenate(values) if values else np.empty((0, *shape), dtype=dtype)
+
+    tmp_filepath = f'{filepath}.tmp'
+    with open(tmp_filepath, 'wb') as f:
+        np.savez(f, **arrays)
+    os.replace(tmp_filepath, filepath)
+
+def read_npz(filepath) -> SkeletonStore:
+    """Load armatures stored by write_npz into a new store"""
+    store = SkeletonStore()
+    with np.load(filepath) as data:
+        arrays = {k: data[k] for k in data.files}
+    offsets = arrays['offsets'].tolist()
+    for i, (game_id, model_id, name) in enumerate(zip(arrays['game_ids'].tolist(), arrays['model_ids'].tolist(), arrays['names'].tolist())):
+        bones = slice(offsets[i], offsets[i+1])
+        store.add(SkeletonArmature(game_id, model_id, name, arrays['parents'][bones],
+                                   arrays['heads'][bones], arrays['tails'][bones], arrays['has_tail'][bones]))
+    return store
+
+def read_xml(filepath) -> SkeletonStore:
+    """Parse SkeletonData.xml into a new store"""
+    store = SkeletonStore()
+    root = ET.parse(filepath).getroot()
+    for game in root.iterfind('Game'):
+        game_id = int(game.get('ID'))
+        for arm in game.iterfind('Armature'):
+            bones = arm.findall('Bone')
+            parents = np.empty(len(bones), dtype=np.int32)
+            heads = np.zeros((len(bones), 3), dtype=np.float32)
+            tails = np.zeros((len(bones), 3), dtype=np.float32)
+            has_tail = np.zeros(len(bones), dtype=bool)
+            for i, bone in enumerate(bones):
+                parents[i] = int(bone.get('p_ID'))
+                for data in bone.iterfind('Data'):
+                    if data.get('type') == 'HEAD':
+                        heads[i] = parse_vector(data.get('Vector'))
+                    elif data.get('type') == 'TAIL':
+                        tails[i] = parse_vector(data.get('Vector'))
+                        has_tail[i] = True
+            store.add(SkeletonArmature(game_id, int(arm.get('m_ID')), arm.get('name'), parents, heads, tails, has_tail))
+    return store
+
+
+_stores: dict[str, tuple[int, SkeletonStore]] = {}
+_stores_lock = threading.Lock()
+
+def load(filepath) -> SkeletonStore:
+    """Get the store of Skeleton Data file, parsing it only on first use or after it changed"""
+    filepath = os.path.abspath(filepath)
+    mtime = os.stat(filepath).st_mtime_ns
+    with _stores_lock:
+        cached = _stores.get(filepath)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        store = read_npz(filepath) if filepath.endswith('.npz') else read_xml(filepath)
+        _stores[filepath] = (mtime, store)
+        return store
+
+def clear():
+    """Drop all loaded stores"""
+    with _stores_lock:
+        _stores.clear()
@@ -0,0 +1,125 @@
+"""Concurrent conversion of DDS textures to PNGs with an external tool."""
+import os, subprocess, threading
+import os.path as Path
+from concurrent.futures import ThreadPoolExecutor, Future
+
+TEXCONV_ARGS = ("{inputs}", "-nologo", "-o", "{out_dir}", "-ft", "png")
+"""Default texconv.exe arguments, '{inputs}' expands to all DDS filepaths of a batch"""
+
+def texture_paths(tex_name:str, folder:str, game_id:int, png_export_path="", exists=Path.exists) -> tuple[str, str, str]:
+    """Get paths of a texture in game's TEX 'folder', 'exists' is used to test files existence.\n
+    Returns tuple[PNG filepath, DDS filepath, PNG directory]"""
+    png_filename = f"{tex_name}.png"
+    if not png_export_path:
+        path_png_dir = Path.join(folder, 'PNGs')
+    else:
+        # if texture is not in custom PNG main directory, look for it in custom directory's game ID folder
+        if not exists(Path.join(png_export_path, png_filename)):
+            path_png_dir = Path.join(png_export_path, str(game_id))
+        else:
+            path_png_dir = png_export_path
+
+    return Path.join(path_png_dir, png_filename), Path.join(folder, f"{tex_name}.dds"), path_png_dir
+
+
+class TextureFileIndex:
+    """Listings of texture directories, each read once, to test files existence without a stat call per lookup.\n
+    Files created after a directory was listed have to be registered with 'add'."""
+    def __init__(self):
+        self.listings: dict[str, set[str]] = {}
+        self._lock = threading.Lock()
+
+    def listing(self, dirpath:str) -> set[str]:
+        dirpath = Path.normcase(Path.abspath(dirpath))
+        with self._lock:
+            names = self.listings.get(dirpath)
+            if names is None:
+                try:
+                    names = {Path.normcase(n) for n in os.listdir(dirpath)}
+                except OSError:
+                    names = set()
+                self.listings[dirpath] = names
+        return names
+
+    def exists(self, filepath:str) -> bool:
+        dirpath, filename = Path.split(filepath)
+        return Path.normcase(filename) in self.listing(dirpath)
+
+    def add(self, filepath:str):
+        dirpath, filename = Path.split(filepath)
+        names = self.listing(dirpath)
+        with self._lock:
+            names.add(Path.normcase(filename))
+
+
+class DDSConverter:
+    """Command line DDS to PNG converter, texconv.exe by default.\n
+    Any other tool (or a stand-in script for testing) can be used by giving its
+    'tool_path' and 'args' template with '{inputs}' and '{out_dir}' placeholders."""
+    def __init__(self, tool_path:str, args=TEXCONV_ARGS, batch_size=16):
+        self.tool_path = tool_path
+        self.args = args
+        self.batch_size = batch_size
+        """Max amount of DDS files passed to a single tool invocation"""
+
+    def build_command(self, dds_paths:list[str], out_dir:str) -> list[str]:
+        cmd = [self.tool_path]
+        for arg in self.args:
+            if arg == "{inputs}":
+                cmd.extend(dds_paths)
+            else:
+                cmd.append(arg.format(out_dir=out_dir))
+        return cmd
+
+    def convert(self, dds_paths:list[str], out_dir:str) -> int:
+        """Run the tool for given DDS files, blocking until it's done. Returns tool's exit code."""
+        if not Path.exists(out_dir):
+            print(f"{out_dir} does not exists, creating...")
+            os.makedirs(out_dir, exist_ok=True)
+        return subprocess.run(self.build_command(dds_paths, out_dir)).returncode
+
+
+class DDSConversionQueue:
+    """Deduplicating queue running a bounded amount of converter processes concurrently.\n
+    DDS files submitted together for the same output directory are batched into single tool invocations."""
+    def __init__(self, converter:DDSConverter, max_workers=None):
+        self.converter = converter
+        self.pool = ThreadPoolExecutor(max_workers or min(4, os.cpu_count() or 1))
+        self.jobs: dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, dds_paths:list[str], out_dir:str):
+        """Queue conversion of DDS files into 'out_dir', skipping already queued ones."""
+        with self._lock:
+            new_paths = list(dict.fromkeys(p for p in dds_paths if p not in self.jobs))
+            for i in range(0, len(new_paths), self.converter.batch_size):
+                batch = new_paths[i:i+self.converter.batch_size]
+                job = self.pool.submit(self.converter.convert, batch, out_dir)
+                for p in batch:
+                    self.jobs[p] = job
+
+    def wait(self, dds_path:str, out_dir:str):
+        """Wait for conversion of DDS file, queueing it first if it wasn't yet."""
+        self.submit([dds_path], out_dir)
+        try:
+            self.jobs[dds_path].result()
+        except OSError as e:
+            print(f'Could not run DDS converter: {e}')
+
+    def shutdown(self):
+        self.pool.shutdown(wait=True)
+
+    def prefetch(self, tex_names:list[str], folders:list[tuple[str, int]], png_export_path="", exists=Path.exists):
+        """Queue conversion of every texture that has a DDS but no PNG yet in the first folder it's found in."""
+        batches: dict[str, list[str]] = {}
+        for tex_name in tex_names:
+            for folder, game_id in folders:
+                path_png, path_dds, path_png_dir = texture_paths(tex_name, folder, game_id, png_export_path, exists)
+                if exists(path_png):
+                    break
+                if exists(path_dds):
+                    batches.setdefault(path_png_dir, []).append(path_dds)
+                    break
+
+        for out_dir, dds_paths in batches.items():
+            self.submit(dds_paths, out_dir)
@@ -0,0 +1,194 @@
+"""On-disk cache of decoded TRM data.
+
+Entries are .npz files named by a hash of TRM path, size and modification time,
+so any change to the TRM file makes its old entry unreachable. Least recently
+used entries are evicted once the cache grows past its size limit.
+"""
+import numpy as np
+import os, hashlib, threading, time, zipfile
+
+try:
+    from . import trm_format
+except ImportError:
+    import trm_format
+
+TRM_CACHE_DIRPATH = "lib_user/TRMCache"
+TRM_CACHE_VERSION = 1
+"""Bump whenever the stored layout changes to invalidate existing entries"""
+TRM_CACHE_MAX_SIZE = 512 * 1024**2
+"""Default cache size limit in bytes"""
+TRM_CACHE_TMP_MAX_AGE = 3600
+"""Seconds after which a temporary file is considered left over by an interrupted store"""
+
+def trm_to_arrays(trm: trm_format.TRM_Data) -> dict[str, np.ndarray]:
+    """Flatten TRM data into a dict of arrays for np.savez"""
+    shaders = [[sh.type, *sh.data, *(i for sh_ids in sh.indices for i in sh_ids)] for sh in trm.shaders]
+    arrays = {
+        'shaders': np.array(shaders, dtype=np.uint32).reshape(-1, 11),
+        'textures': trm.textures,
+        'indices': trm.indices,
+        'vertices': trm.vertices,
+    }
+    if trm.anim:
+        arrays['anim_bones'] = trm.anim.bones
+        arrays['anim_unknown2'] = trm.anim.unknown2
+        arrays['anim_unknown3'] = trm.anim.unknown3
+        arrays['anim_unknown4'] = trm.anim.unknown4
+        arrays['anim_counts'] = np.array([trm.anim.num_unknown4, trm.anim.unknown5], dtype=np.uint16)
+    return arrays
+
+def trm_from_arrays(arrays) -> trm_format.TRM_Data:
+    """Rebuild TRM data from arrays stored by trm_to_arrays"""
+    trm = trm_format.TRM_Data()
+    for sh in arrays['shaders'].tolist():
+        sh_ids = tuple(trm_format.TRM_ShaderIndices(sh[i], sh[i+1]) for i in range(5, 11, 2))
+        trm.shaders.append(trm_format.TRM_ShaderRecord(sh[0], tuple(sh[1:5]), sh_ids))
+    trm.textures = arrays['textures']
+    trm.indices = arrays['indices']
+    trm.vertices = arrays['vertices']
+    if 'anim_bones' in arrays:
+        num_unknown4, unknown5 = arrays['anim_counts'].tolist()
+        trm.anim = trm_format.TRM_AnimData(arrays['anim_bones'], arrays['anim_unknown2'], arrays['anim_unknown3'],
+                                           num_unknown4, unknown5, arrays['anim_unknown4'])
+    return trm
+
+
+class TRMCache:
+    """Persistent cache of decoded TRM files in 'cache_dir', disabled when 'max_size' is 0.
+
+    Caching is best-effort: entries that can't be read or written are skipped
+    and the TRM file is decoded as usual.
+    """
+    def __init__(self, cache_dir, max_size=TRM_CACHE_MAX_SIZE):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._total_size = None
+        """Size of all entries, scanned once on first store and then tracked in memory"""
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    def entry_path(self, filepath) -> str:
+        """Path to the cache entry of TRM file at 'filepath'"""
+        stat = os.stat(filepath)
+        key = f'{TRM_CACHE_VERSION}|{os.path.abspath(filepath)}|{stat.st_size}|{stat.st_mtime_ns}'
+        return os.path.join(self.cache_dir, hashlib.sha1(key.encode()).hexdigest() + '.npz')
+
+    def get(self, filepath) -> trm_format.TRM_Data | None:
+        """Return cached TRM data for 'filepath' or None if there's no valid entry"""
+        try:
+            entry = self.entry_path(filepath)
+        except OSError:
+            # missing TRM file, let the decoder report it
+            return None
+        if not os.path.exists(entry):
+            return None
+        try:
+            with np.load(entry) as arrays:
+                trm = trm_from_arrays(arrays)
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+            # broken or evicted entry, drop it and decode the TRM again
+            self.remove(entry)
+            return None
+        # mark entry as recently used, it may have been evicted by another thread meanwhile
+        try:
+            os.utime(entry)
+        except OSError:
+            pass
+        return trm
+
+    def put(self, filepath, trm: trm_format.TRM_Data):
+        """Store decoded TRM data for 'filepath' and evict old entries if over size limit"""
+        entry_tmp = None
+        try:
+            entry = self.entry_path(filepath)
+            os.makedirs(self.cache_dir, exist_ok=True)
+            entry_tmp = f'{entry}.{threading.get_ident()}.tmp'
+            with open(entry_tmp, 'wb') as f:
+                np.savez(f, **trm_to_arrays(trm))
+            added_size = os.path.getsize(entry_tmp) - self.file_size(entry)
+            os.replace(entry_tmp, entry)
+        except OSError:
+            # read-only add-on directory, full disk...
+            if entry_tmp:
+                self.remove(entry_tmp)
+            return
+        self.evict(added_size)
+
+    def load(self, filepath) -> trm_format.TRM_Data:
+        """Get TRM data from cache, or decode the file and cache it"""
+        if not self.enabled:
+            return trm_format.load(filepath)
+        trm = self.get(filepath)
+        if trm is None:
+            trm = trm_format.load(filepath)
+            self.put(filepath, trm)
+        return trm
+
+    def file_size(self, path) -> int:
+        try:
+            return os.path.getsize(path)
+        except OSError:
+            return 0
+
+    def remove(self, entry):
+        try:
+            os.remove(entry)
+        except OSError:
+            pass
+
+    def scan(self, tmp_max_age=TRM_CACHE_TMP_MAX_AGE) -> list[tuple[float, int, str]]:
+        """(modification time, size, path) of all entries. Removes temporary files
+        older than 'tmp_max_age' seconds, left over by interrupted stores."""
+        entries = []
+        tmp_time = time.time() - tmp_max_age
+        try:
+            with os.scandir(self.cache_dir) as it:
+                for e in it:
+                    if not e.name.endswith(('.npz', '.tmp')):
+                        continue
+                    try:
+                        st = e.stat()
+                    except OSError:
+                        continue
+                    if e.name.endswith('.npz'):
+                        entries.append((st.st_mtime, st.st_size, e.path))
+                    elif st.st_mtime <= tmp_time:
+                        self.remove(e.path)
+        except OSError:
+            pass
+        return entries
+
+    def evict(self, added_size=0):
+        """Remove least recently used entries when cache grows past its size limit.
+
+        The directory is only scanned on first call and when over the limit, which
+        frees some headroom so the following stores don't scan it again.
+        """
+        with self._lock:
+            if self._total_size is None:
+                self._total_size = sum(size for _, size, _ in self.scan())
+            else:
+                self._total_size += added_size
+            if self._total_size <= self.max_size:
+                return
+
+            entries = self.scan()
+            total_size = sum(size for _, size, _ in entries)
+            target_size = self.max_size * 9 // 10
+            entries.sort()
+            for _, size, path in entries:
+                if total_size <= target_size:
+                    break
+                self.remove(path)
+                total_size -= size
+            self._total_size = total_size
+
+    def clear(self):
+        """Remove all cache entries"""
+        with self._lock:
+            for _, _, path in self.scan(tmp_max_age=0):
+                self.remove(path)
+            self._total_size = None
@@ -1,12 +1,12 @@
-import bpy, math, bmesh, time, os
-from struct import pack
-from mathutils import Vector
+import bpy, bmesh, time, os
+import numpy as np
 
 from bpy_extras.io_utils import ExportHelper
 from bpy.props import StringProperty, BoolProperty, FloatProperty
 from bpy.types import Operator
 from . import utils as trm_utils
-from .bin_parse import TRM_HEADER, TRM_FORMAT, TRM_ANIM_FORMAT
+from . import trm_format
+from .bin_parse import TRM_FORMAT, TRM_ANIM_FORMAT, TRM_VERTEX_DTYPE
 
 class TR123R_OT_ExportTRM(Operator, ExportHelper):
     """Save object as TRM file"""
@@ -121,48 +121,30 @@ class TR123R_OT_ExportTRM(Operator, ExportHelper):
         result = {'PASS_THROUGH'}, trm, objs
         return result
     
-    def normal_float_to_byte(self, normal:Vector):
-        normal.negate()
-        xyz = []
-        for f in normal:
-            f *= 126
-            f = round(f+127)
-            xyz.append(f)
-        return xyz
-
     # VERTEX PACKER
-    def pack_vertex(self, coordinate: list, normal, texture, groups, uv):
-        # negate and pack normals in XZY order
-        nrs = self.normal_float_to_byte(Vector((normal[0], normal[2], normal[1])))
-
-        # vertices in XZY order
-        vs = []
-        for i in [0, 2, 1]:
-            vs.append(-coordinate[i] * self.scale)
-            
+    def pack_vertices(self, coordinates: np.ndarray, normals: np.ndarray, textures: np.ndarray, groups: np.ndarray, weights: np.ndarray, uvs: np.ndarray) -> np.ndarray:
+        """Pack per-corner arrays into a structured array of TRM vertices"""
+        packed = np.empty(len(coordinates), dtype=TRM_VERTEX_DTYPE)
+
+        # vertices and negated normals in XZY order
+        packed['pos'] = coordinates[:, [0, 2, 1]] * -self.scale
+        packed['normal'] = trm_format.normals_to_bytes(normals[:, [0, 2, 1]])
+
         # vertex groups and weights
-        gs, ws = [0, 0, 0], [255, 0, 0]
-        for i in range(3):
-            if len(groups) > i:
-                gr = groups[i].group
-                w = round(groups[i].weight * 255)
-                gs[i], ws[i] = gr, w
+        packed['joints'] = groups
+        packed['weights'] = weights
 
         # texture and UV
-        tex = texture + 1
-        tu = round(uv[0] * 255)
-        tv = 255 - round(uv[1] * 255)
-        return pack("<fff12B", *vs, *nrs, tex, *gs, tu, *ws, tv)
+        packed['tex'] = textures + 1
+        packed['u'] = np.round(uvs[:, 0] * 255)
+        packed['v'] = 255 - np.round(uvs[:, 1] * 255)
+        return packed
     
-    def uv_offset(self, x):
-        if x > 0.0:
-            offset = -(math.ceil(x/1.0)-1)
-        else:
-            offset = -math.floor(x/1.0)
-        return x+offset
+    def uv_offset(self, x: np.ndarray) -> np.ndarray:
+        return np.where(x > 0.0, x - (np.ceil(x) - 1), x - np.floor(x))
     
     def save_shader_data(self, shader_map, id=0, data = [0,0,0,0,0]):
-        shader_map[id] = {'pack': pack("<5I", *data)}
+        shader_map[id] = {'data': data}
         for st in trm_utils.SHADER_SUBTYPES:
             shader_map[id][st] = []
         
@@ -235,175 +217,150 @@ class TR123R_OT_ExportTRM(Operator, ExportHelper):
             shader_map = self.save_shader_data(shader_map)
 
         # PREPARE INDICES & VERTICES DATA
-        vertices = []
-        num_vertices = len(vertices)
-        uvs = trm_mesh.uv_layers.active
-        v_order = [0, 2, 1]
-
-        uv_err_occured = False
-        for p in trm_mesh.polygons:
-            mat_info = mat_map[p.material_index]
-            for i in v_order:
-                loop = trm_mesh.loops[p.loop_indices[i]]
-                groups = trm_mesh.vertices[loop.vertex_index].groups
-                if len(groups) > 3:
-                    self.report({'ERROR'}, "Maximum 3 Joints Allowed per Vertex!")
-                    return {'CANCELLED'}
-                
-                uv = uvs.data[p.loop_indices[i]].uv
-                uv_out_U = uv[0] < 0 or uv[0] > 1.0
-                uv_out_V = uv[1] < 0 or uv[1] > 1.0
-                if not uv_err_occured and (uv_out_U or uv_out_V):
-                    self.report({'WARNING'}, "UV Out of Bounds! Wrapping around...")
-                    uv_err_occured = True
-
-                # offset UVs if they're beyond [0.0, 1.0] range
-                uv[0] = self.uv_offset(uv[0]) if uv_out_U else uv[0]
-                uv[1] = self.uv_offset(uv[1]) if uv_out_V else uv[1]
-  
-                vertex = self.pack_vertex(
-                    trm_mesh.vertices[loop.vertex_index].co,
-                    loop.normal,
-                    mat_info['TexID'],
-                    groups,
-                    uv
-                )
-                indices = shader_map[mat_info['ShaderID']][mat_info['ShaderSubtype']]
-                if vertex in vertices:
-                    indices.append(vertices.index(vertex))
-                else:
-                    indices.append(num_vertices)
-                    vertices.append(vertex)
-                    num_vertices += 1
+        num_polys = len(trm_mesh.polygons)
+        num_loops = len(trm_mesh.loops)
+
+        poly_mats = np.empty(num_polys, dtype=np.int32)
+        trm_mesh.polygons.foreach_get('material_index', poly_mats)
+        poly_starts = np.empty(num_polys, dtype=np.int32)
+        trm_mesh.polygons.foreach_get('loop_start', poly_starts)
+        # face corners in flipped winding order
+        loop_ids = (poly_starts[:, None] + np.array([0, 2, 1], dtype=np.int32)).ravel()
+
+        loop_verts = np.empty(num_loops, dtype=np.int32)
+        trm_mesh.loops.foreach_get('vertex_index', loop_verts)
+        loop_normals = np.empty(num_loops*3, dtype=np.float32)
+        trm_mesh.loops.foreach_get('normal', loop_normals)
+        loop_uvs = np.empty(num_loops*2, dtype=np.float32)
+        trm_mesh.uv_layers.active.data.foreach_get('uv', loop_uvs)
+        vert_cos = np.empty(len(trm_mesh.vertices)*3, dtype=np.float32)
+        trm_mesh.vertices.foreach_get('co', vert_cos)
+
+        # vertex groups and weights, up to 3 per vertex
+        vert_groups = np.zeros((len(trm_mesh.vertices), 3), dtype=np.int32)
+        vert_weights = np.zeros((len(trm_mesh.vertices), 3), dtype=np.uint8)
+        vert_weights[:, 0] = 255
+        vert_overflow = np.zeros(len(trm_mesh.vertices), dtype=bool)
+        for v in trm_mesh.vertices:
+            groups = v.groups
+            if len(groups) > 3:
+                vert_overflow[v.index] = True
+                continue
+            for i, g in enumerate(groups):
+                vert_groups[v.index, i] = g.group
+                vert_weights[v.index, i] = round(g.weight * 255)
+
+        loop_verts = loop_verts[loop_ids]
+        if vert_overflow[loop_verts].any():
+            self.report({'ERROR'}, "Maximum 3 Joints Allowed per Vertex!")
+            return {'CANCELLED'}
 
-        # GET ELEMENT COUNTS
-        num_textures = len(textures)
-        num_vertices = len(vertices)
+        # joints and texture indices are stored in single bytes, check they fit before packing
+        if vert_groups[loop_verts].max(initial=0) > 0xff:
+            self.report({'ERROR'}, f"Vertex Group Index Too High! Maximum is {0xff}, remove unused Vertex Groups.")
+            return {'CANCELLED'}
 
-        f = open(filepath, 'wb')
+        if len(textures) > 0xff:
+            self.report({'ERROR'}, f"Too many textures: {len(textures)}! Maximum is {0xff}.")
+            return {'CANCELLED'}
 
-        # TRM\x02 marker
-        f.write(pack(">I", TRM_HEADER))
+        mat_tex_ids = np.array([mat_info['TexID'] for mat_info in mat_map], dtype=np.int32)
+        if (mat_tex_ids[poly_mats] >= len(textures)).any():
+            self.report({'ERROR'}, f'Mesh "{trm_mesh.name}" has faces assigned to an empty material slot!')
+            return {'CANCELLED'}
 
-        # SHADER DATA
-        indices = []
-        f.write(pack("<I", len(shader_map)))
-        for s in shader_map.keys():
-            shd = shader_map[s]
-            f.write(shd['pack'])
-            for sh_subtype in trm_utils.SHADER_SUBTYPES:
-                f.write(pack("<2I", len(indices), len(shd[sh_subtype])))
-                indices.extend(shd[sh_subtype])
+        loop_uvs = loop_uvs.reshape(-1, 2)[loop_ids].astype(np.float64)
+        uv_out = (loop_uvs < 0) | (loop_uvs > 1.0)
+        if uv_out.any():
+            self.report({'WARNING'}, "UV Out of Bounds! Wrapping around...")
+            # offset UVs if they're beyond [0.0, 1.0] range
+            loop_uvs = np.where(uv_out, self.uv_offset(loop_uvs), loop_uvs)
+
+        packed = self.pack_vertices(
+            vert_cos.reshape(-1, 3)[loop_verts].astype(np.float64),
+            loop_normals.reshape(-1, 3)[loop_ids].astype(np.float64),
+            np.repeat(mat_tex_ids[poly_mats], 3),
+            vert_groups[loop_verts],
+            vert_weights[loop_verts],
+            loop_uvs
+        )
+
+        # deduplicate packed vertices, keeping them in order of first appearance
+        packed_bytes = packed.view(np.dtype((np.void, TRM_VERTEX_DTYPE.itemsize)))
+        _, first_ids, unique_ids = np.unique(packed_bytes, return_index=True, return_inverse=True)
+        order = np.argsort(first_ids)
+        vertex_ids = np.empty_like(order)
+        vertex_ids[order] = np.arange(len(order))
+        vertices = packed[first_ids[order]]
+        face_indices = vertex_ids[unique_ids.ravel()].reshape(-1, 3)
+
+        # sort faces into shader subtype index lists, keeping their order
+        groups = []
+        for mat_info in mat_map:
+            group = (mat_info['ShaderID'], mat_info['ShaderSubtype'])
+            if group not in groups:
+                groups.append(group)
+        mat_groups = np.array([groups.index((mat_info['ShaderID'], mat_info['ShaderSubtype'])) for mat_info in mat_map], dtype=np.int32)
+        poly_groups = mat_groups[poly_mats]
+        for g_i, (sh_ID, sh_subtype) in enumerate(groups):
+            group_faces = face_indices[poly_groups == g_i]
+            if len(group_faces):
+                shader_map[sh_ID][sh_subtype] = group_faces.ravel()
+
+        # GET ELEMENT COUNTS
+        num_textures = len(textures)
+        num_vertices = len(vertices)
 
-        num_indices = len(indices)
+        # vertex indices are 16-bit
+        if num_vertices > 0x10000:
+            self.report({'ERROR'}, f"Too many vertices: {num_vertices}! Maximum is {0x10000}.")
+            return {'CANCELLED'}
 
-        # TEXTURES
-        f.write(pack("<I", num_textures))
         for tex in textures:
-            if 0 <= tex <= 0xffff:
-                f.write(pack("<H", tex))
-            else:
+            if not 0 <= tex <= 0xffff:
                 self.report({'ERROR'}, "Invalid Material Prefix: %s!" % f'{tex}')
                 return {'CANCELLED'}
 
-        # BYTE ALIGN
-        while f.tell() % 4: f.write(b"\x00")
+        # SHADER DATA
+        shaders = []
+        indices = []
+        num_indices = 0
+        for shd in shader_map.values():
+            sh_ids = []
+            for sh_subtype in trm_utils.SHADER_SUBTYPES:
+                sh_ids.append(trm_format.TRM_ShaderIndices(num_indices, len(shd[sh_subtype])))
+                indices.append(np.asarray(shd[sh_subtype], dtype='<u2'))
+                num_indices += len(shd[sh_subtype])
+            shaders.append(trm_format.TRM_ShaderRecord(shd['data'][0], tuple(shd['data'][1:]), tuple(sh_ids)))
 
         # BONE ANIM DATA INJECTION
-        num_anim_bones = 0
+        anim = None
         if self.export_anim:
             filepath_split = self.filepath.rsplit('\\', 1)
             filename = filepath_split[-1].removesuffix(self.filename_ext)
-            # print(f'Directory: {filepath_split[0]}\\')
-            # print(f'Filename: {filename}')
             trm_anim_filepath = f'{filepath_split[0]}\\{filename}{TRM_ANIM_FORMAT}'
-            # print(trm_anim_filepath)
             if os.path.exists(trm_anim_filepath):
                 print("-------------------------------------------------")
                 print(f'INJECTING ANIM DATA FROM "{trm_anim_filepath}" FILE...')
-                from . import bin_parse
-                with open(trm_anim_filepath, 'rb') as f_anim:
-                    # check for TRM\x02 marker
-                    if bin_parse.is_TRM_header(f_anim):
-                        num_anim_bones = bin_parse.read_uint32(f_anim)
-                        if num_anim_bones > 0:
-                            anim_bones = tuple(bin_parse.read_float_tuple(f_anim, 12) for n in range(num_anim_bones))
-                                
-                            num_anim_unknown2 = bin_parse.read_uint32(f_anim)
-                            anim_unknown2 = tuple(bin_parse.read_uint32_tuple(f_anim, 2) for n in range(num_anim_unknown2))
-                            
-                            num_anim_unknown3 = bin_parse.read_uint32(f_anim)
-                            anim_unknown3 = bin_parse.read_uint32_tuple(f_anim, num_anim_unknown3) # Frame numbers?
-                            
-                            num_anim_unknown4 = bin_parse.read_ushort16(f_anim)
-                            num_anim_unknown5 = bin_parse.read_ushort16(f_anim)  # this is unused, still unknown
-                            anim_unknown4 = tuple(bin_parse.read_float_tuple(f_anim, 12) for n in range(num_anim_unknown3 * num_anim_unknown4))
-
-                            f.write(pack("<I", num_anim_bones))
-                            f.write(pack("<%df" % (12*num_anim_bones), *[x for y in anim_bones for x in y]))
-                            f.write(pack("<I", num_anim_unknown2))
-                            f.write(pack("<%dI" % (2*num_anim_unknown2), *[x for y in anim_unknown2 for x in y]))
-                            f.write(pack("<I", num_anim_unknown3))
-                            f.write(pack("<%dI" % num_anim_unknown3, *anim_unknown3))
-                            f.write(pack("<H", num_anim_unknown4))
-                            f.write(pack("<H", num_anim_unknown5))
-                            f.write(pack("<%df" % (12*num_anim_unknown3 * num_anim_unknown4), *[x for y in anim_unknown4 for x in y]))
-
-                            # DEBUG
-                            if False:
-                                print(f'Bone amount: {num_anim_bones}')
-                                n = 0
-                                if n > -1:
-                                    print(f'Bone data at [{n}]: {anim_bones[n]}')
-                                else:
-                                    print(f'Bone data: {anim_bones}')
-
-                                print(f'Animation Data2: {num_anim_unknown2}')
-                                n = -1
-                                if n > -1:
-                                    print(f'Unknown data 2 at [{n}]: {anim_unknown2[n]}')
-                                else:
-                                    print(f'Unknown data 2: {anim_unknown2}')
-
-                                print(f'Animation Data3: {num_anim_unknown3}')
-                                n = -1
-                                if n > -1:
-                                    print(f'Unknown data 3 at [{n}]: {anim_unknown3[n]}')
-                                else:
-                                    print(f'Unknown data 3: {anim_unknown3}')
-
-                                print(f'Animation Data4: {num_anim_unknown4}')
-                                print(f'Animation Data5: {num_anim_unknown5}')
-                                n = 0
-                                if n > -1:
-                                    print(f'Unknown data 4 at [{n}]: {anim_unknown4[n]}')
-                                else:
-                                    print(f'Unknown data 4: {anim_unknown4}')
-                    else:
-                        self.report({'ERROR'}, f'"{filename}{TRM_ANIM_FORMAT}" file is not a {TRM_ANIM_FORMAT} file! Skipping anim data...')
-                del bin_parse
+                try:
+                    anim = trm_format.load_anim(trm_anim_filepath)
+                except trm_format.TRMFormatError:
+                    self.report({'ERROR'}, f'"{filename}{TRM_ANIM_FORMAT}" file is not a {TRM_ANIM_FORMAT} file! Skipping anim data...')
             else:
                 self.report({'WARNING'}, f'{TRM_ANIM_FORMAT} file not found at "{trm_anim_filepath}"! Skipping anim data...')
 
-        # BONE ANIM DATA FALLBACK (CURRENTLY UNKNOWN)
-        if num_anim_bones == 0:
-            f.write(pack("<I", 0))
-
-        # INDICE & VERTICE COUNTS
-        f.write(pack("<2I", num_indices, num_vertices))
-
-        # WRITE INDICES
-        f.write(pack("<%dH" % num_indices, *indices))
-
-        # BYTE ALIGN
-        while f.tell() % 4: f.write(b"\x00")
-
-        # WRITE VERTICES
-        for v in vertices:
-            f.write(v)
+        trm_data = trm_format.TRM_Data(
+            shaders=shaders,
+            textures=np.array(textures, dtype='<u2'),
+            anim=anim,
+            indices=np.concatenate(indices),
+            vertices=vertices,
+        )
+        trm_format.dump(trm_data, filepath)
 
-        f.close()
         print("%d Textures, %d Indices, %d Vertices, %d Bones" % (num_textures, num_indices, num_vertices, len(trm.vertex_groups)))
+        dedup_ratio = 1 - num_vertices/num_loops if num_loops else 0.0
+        self.report({'INFO'}, "Deduplicated %d face corners into %d vertices (%.1f%% shared)" % (num_loops, num_vertices, dedup_ratio*100))
         print("DONE!")
 
         return {'FINISHED'}
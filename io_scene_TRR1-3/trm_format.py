@@ -0,0 +1,295 @@
+"""Reading and writing of TRM model files without Blender.
+
+Only depends on numpy and bin_parse, so the binary paths can be profiled and
+tested under plain CPython by putting this directory on sys.path:
+    import trm_format
+    trm = trm_format.load("OUTFIT_TR1.TRM")
+    trm_format.dump(trm, "OUTFIT_TR1_copy.TRM")
+"""
+import numpy as np
+import os, mmap
+from struct import pack, error as struct_error
+from dataclasses import dataclass, field
+from typing import NamedTuple
+
+try:
+    from . import bin_parse
+except ImportError:
+    import bin_parse
+
+class TRMFormatError(ValueError):
+    """Raised when a file doesn't follow the TRM/TRMA layout."""
+
+
+class TRM_ShaderIndices(NamedTuple):
+    """Vertex Indices tuple[offset, length] for Shader data of TRM file"""
+    offset: int = 0
+    """Face vertex offset at which shader subtype begins its range."""
+    length: int  = 0
+    """Amount of face vertices which the shader subtype is defined for."""
+
+
+class TRM_ShaderRecord(NamedTuple):
+    """Raw shader entry as stored in TRM file"""
+    type: int = 0
+    """Type or flags(?) values seen: 0, 2, 3, 6, 12, 14, 18, 19"""
+    data: tuple[int, int, int, int] = (0, 0, 0, 0)
+    """4 unknown values, each 4 bytes read as little-endian unsigned int (RGBA bytes)"""
+    indices: tuple[TRM_ShaderIndices, TRM_ShaderIndices, TRM_ShaderIndices] = (TRM_ShaderIndices(),)*3
+    """Index ranges for each shader subtype"""
+
+
+@dataclass
+class TRM_AnimData:
+    """Unknown animation data block, stored as-is in TRMA files"""
+    bones: np.ndarray = field(default_factory=lambda: np.zeros((0, 12), dtype='<f4'))
+    """(N, 12) floats per animated bone"""
+    unknown2: np.ndarray = field(default_factory=lambda: np.zeros((0, 2), dtype='<u4'))
+    """(N, 2) unsigned ints"""
+    unknown3: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype='<u4'))
+    """Frame numbers?"""
+    num_unknown4: int = 0
+    unknown5: int = 0
+    """This is unused, still unknown"""
+    unknown4: np.ndarray = field(default_factory=lambda: np.zeros((0, 12), dtype='<f4'))
+    """(len(unknown3) * num_unknown4, 12) floats"""
+
+
+@dataclass
+class TRM_Data:
+    """Contents of a TRM file"""
+    shaders: list[TRM_ShaderRecord] = field(default_factory=list)
+    textures: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype='<u2'))
+    """Texture IDs, referenced by vertex 'tex' field starting from 1"""
+    anim: TRM_AnimData | None = None
+    indices: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype='<u2'))
+    """Triangle vertex indices"""
+    vertices: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=bin_parse.TRM_VERTEX_DTYPE))
+    """Structured array of bin_parse.TRM_VERTEX_DTYPE"""
+
+    @property
+    def num_joints(self) -> int:
+        return int(self.vertices['joints'].max()) + 1 if len(self.vertices) else 1
+
+    def copy(self) -> 'TRM_Data':
+        """Return a copy owning all of its arrays."""
+        anim = None
+        if self.anim:
+            anim = TRM_AnimData(self.anim.bones.copy(), self.anim.unknown2.copy(), self.anim.unknown3.copy(),
+                                self.anim.num_unknown4, self.anim.unknown5, self.anim.unknown4.copy())
+        return TRM_Data(list(self.shaders), self.textures.copy(), anim, self.indices.copy(), self.vertices.copy())
+
+
+def normals_from_bytes(normals: np.ndarray) -> np.ndarray:
+    """Decode (N, 3) normal bytes offset by 127 into negated unit float vectors."""
+    vecs = np.asarray(normals, dtype=np.float32) - 127
+    lengths = np.linalg.norm(vecs, axis=1, keepdims=True)
+    return -np.divide(vecs, lengths, out=np.zeros_like(vecs), where=lengths > 0)
+
+def normals_to_bytes(normals: np.ndarray) -> np.ndarray:
+    """Negate and quantize (N, 3) float normals into bytes offset by 127."""
+    return np.clip(np.round(np.asarray(normals, dtype=np.float64) * -126 + 127), 0, 255).astype(np.uint8)
+
+def _edge_keys(edges: np.ndarray, num_verts: int) -> np.ndarray:
+    edges = np.sort(edges, axis=1).astype(np.int64)
+    return edges[:, 0] * num_verts + edges[:, 1]
+
+def weld_boundary_vertices(positions: np.ndarray, faces: np.ndarray, dist=0.0001) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Merge vertices of open (boundary) edges that share a position within 'dist' grid cells,
+    welding the mesh along its UV seams without changing faces or their order.\n
+    Returns (kept, vertex_map, seam_edges):
+    - kept: indices of original vertices that remain, in original order
+    - vertex_map: new index for every original vertex, to remap faces with vertex_map[faces]
+    - seam_edges: (N, 2) new vertex pairs of edges that were open and got welded"""
+    num_verts = len(positions)
+    faces = np.asarray(faces, dtype=np.int64)
+    face_edges = faces[:, [0, 1, 1, 2, 2, 0]].reshape(-1, 2)
+    edge_keys, edge_counts = np.unique(_edge_keys(face_edges, num_verts), return_counts=True)
+    open_edges = edge_keys[edge_counts == 1]
+    open_edges = np.column_stack((open_edges // num_verts, open_edges % num_verts))
+
+    # group open edge vertices by quantized position, lowest vertex index of a group is kept
+    open_verts = np.unique(open_edges)
+    cells = np.round(positions[open_verts] / dist).astype(np.int64)
+    _, cell_first, cell_ids = np.unique(cells, axis=0, return_index=True, return_inverse=True)
+    weld_map = np.arange(num_verts)
+    weld_map[open_verts] = open_verts[cell_first][cell_ids.ravel()]
+
+    # don't weld vertices that would collapse a face, their faces have to stay intact
+    welded_faces = weld_map[faces]
+    collapsed = (welded_faces[:, 0] == welded_faces[:, 1]) | (welded_faces[:, 1] == welded_faces[:, 2]) | (welded_faces[:, 2] == welded_faces[:, 0])
+    collapsed_verts = faces[collapsed].ravel()
+    weld_map[collapsed_verts] = collapsed_verts
+
+    kept = np.unique(weld_map)
+    vertex_map = np.searchsorted(kept, weld_map)
+
+    # open edges which got a neighbouring face after welding are seams
+    welded_keys, welded_counts = np.unique(_edge_keys(vertex_map[face_edges], len(kept)), return_counts=True)
+    seam_keys = np.intersect1d(_edge_keys(vertex_map[open_edges], len(kept)), welded_keys[welded_counts == 2])
+    seam_edges = np.column_stack((seam_keys // len(kept), seam_keys % len(kept)))
+    return kept, vertex_map, seam_edges
+
+def _write_align(file):
+    while file.tell() % 4: file.write(b"\x00")
+
+def read_anim(reader: bin_parse.BinReader) -> TRM_AnimData | None:
+    """Read animation block at the current reader position. Returns None if it's empty."""
+    num_anim_bones = reader.read_uint32()
+    if num_anim_bones == 0:
+        return None
+
+    anim = TRM_AnimData()
+    anim.bones = reader.read_array('<f4', 12*num_anim_bones).reshape(-1, 12)
+
+    num_unknown2 = reader.read_uint32()
+    anim.unknown2 = reader.read_array('<u4', 2*num_unknown2).reshape(-1, 2)
+
+    num_unknown3 = reader.read_uint32()
+    anim.unknown3 = reader.read_array('<u4', num_unknown3)
+
+    anim.num_unknown4, anim.unknown5 = reader.unpack('<2H')
+    anim.unknown4 = reader.read_array('<f4', 12*num_unknown3*anim.num_unknown4).reshape(-1, 12)
+    return anim
+
+def write_anim(file, anim: TRM_AnimData | None):
+    """Write animation block at the current file position, or an empty one if anim is None."""
+    if anim is None or len(anim.bones) == 0:
+        file.write(pack("<I", 0))
+        return
+
+    file.write(pack("<I", len(anim.bones)))
+    file.write(anim.bones.astype('<f4').tobytes())
+    file.write(pack("<I", len(anim.unknown2)))
+    file.write(anim.unknown2.astype('<u4').tobytes())
+    file.write(pack("<I", len(anim.unknown3)))
+    file.write(anim.unknown3.astype('<u4').tobytes())
+    file.write(pack("<H", anim.num_unknown4))
+    file.write(pack("<H", anim.unknown5))
+    file.write(anim.unknown4.astype('<f4').tobytes())
+
+def _read(reader: bin_parse.BinReader) -> TRM_Data:
+    # TRM\x02 marker
+    if reader.unpack('>I')[0] != bin_parse.TRM_HEADER:
+        raise TRMFormatError("Not a TRM file!")
+
+    trm = TRM_Data()
+
+    # SHADERS
+    # type, 4 unknown pieces of data and 3 pieces of indice data each
+    num_shaders = reader.read_uint32()
+    for sh in reader.read_array('<u4', 11*num_shaders).reshape(-1, 11).tolist():
+        sh_ids = tuple(TRM_ShaderIndices(sh[i], sh[i+1]) for i in range(5, 11, 2))
+        trm.shaders.append(TRM_ShaderRecord(sh[0], tuple(sh[1:5]), sh_ids))
+
+    # TEXTURES
+    num_textures = reader.read_uint32()
+    trm.textures = reader.read_array('<u2', num_textures)
+
+    # BYTE ALIGN
+    reader.align()
+
+    # UNKNOWN ANIMATION DATA
+    trm.anim = read_anim(reader)
+
+    # INDICE & VERTICE COUNTS
+    num_indices, num_vertices = reader.unpack('<2I')
+
+    # READ INDICES
+    trm.indices = reader.read_array('<u2', num_indices)
+
+    # BYTE ALIGN
+    reader.align()
+
+    # READ VERTICES
+    trm.vertices = reader.read_vertex_array(num_vertices)
+    return trm
+
+def read_buffer(buffer) -> TRM_Data:
+    """Read TRM data from a buffer (bytes, mmap, memoryview) holding the whole file.\n
+    Returned arrays are read-only views into the buffer."""
+    try:
+        return _read(bin_parse.BinReader(buffer))
+    except TRMFormatError:
+        raise
+    except (struct_error, ValueError) as e:
+        raise TRMFormatError(f"Truncated or corrupted TRM file! ({e})")
+
+def read(file) -> TRM_Data:
+    """Read TRM data from a binary file object positioned at its start."""
+    return read_buffer(file.read())
+
+def write(file, trm: TRM_Data):
+    """Write TRM data to a binary file object."""
+    # TRM\x02 marker
+    file.write(pack(">I", bin_parse.TRM_HEADER))
+
+    # SHADER DATA
+    file.write(pack("<I", len(trm.shaders)))
+    for sh in trm.shaders:
+        file.write(pack("<5I", sh.type, *sh.data))
+        for sh_ids in sh.indices:
+            file.write(pack("<2I", *sh_ids))
+
+    # TEXTURES
+    file.write(pack("<I", len(trm.textures)))
+    file.write(np.asarray(trm.textures, dtype='<u2').tobytes())
+
+    # BYTE ALIGN
+    _write_align(file)
+
+    # BONE ANIM DATA
+    write_anim(file, trm.anim)
+
+    # INDICE & VERTICE COUNTS
+    file.write(pack("<2I", len(trm.indices), len(trm.vertices)))
+
+    # WRITE INDICES
+    file.write(np.asarray(trm.indices, dtype='<u2').tobytes())
+
+    # BYTE ALIGN
+    _write_align(file)
+
+    # WRITE VERTICES
+    file.write(np.asarray(trm.vertices, dtype=bin_parse.TRM_VERTEX_DTYPE).tobytes())
+
+def load(filepath) -> TRM_Data:
+    """Read TRM file from 'filepath' through a memory map."""
+    with open(filepath, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise TRMFormatError("Not a TRM file!")
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        # copy arrays out of the map, so views don't keep the file mapped (and locked on Windows)
+        return read_buffer(buffer).copy()
+    finally:
+        try:
+            buffer.close()
+        except BufferError:
+            # views are still referenced by an exception traceback, map gets closed once they're collected
+            pass
+
+def dump(trm: TRM_Data, filepath):
+    """Write TRM data into a file at 'filepath'."""
+    with open(filepath, 'wb') as f:
+        write(f, trm)
+
+def load_anim(filepath) -> TRM_AnimData | None:
+    """Read animation data from TRMA file at 'filepath'."""
+    with open(filepath, 'rb') as f:
+        reader = bin_parse.BinReader(f.read())
+    try:
+        if reader.unpack('>I')[0] != bin_parse.TRM_HEADER:
+            raise TRMFormatError(f"Not a {bin_parse.TRM_ANIM_FORMAT} file!")
+        return read_anim(reader)
+    except TRMFormatError:
+        raise
+    except (struct_error, ValueError) as e:
+        raise TRMFormatError(f"Truncated or corrupted {bin_parse.TRM_ANIM_FORMAT} file! ({e})")
+
+def dump_anim(anim: TRM_AnimData, filepath):
+    """Write animation data into TRMA file at 'filepath'."""
+    with open(filepath, 'w+b') as f:
+        # TRM\x02 marker
+        f.write(pack(">I", bin_parse.TRM_HEADER))
+        write_anim(f, anim)
@@ -1,13 +1,13 @@
-import bpy, math, random, subprocess, time
-from struct import unpack
-from mathutils import Vector
+import bpy, math, random, time
+import numpy as np
 import os.path as Path
-from . import bin_parse
+from . import bin_parse, trm_format, trm_cache, tex_convert, dds_decode, skeleton_data
 from . import utils as trm_utils
-from .pdp_utils import SKELETON_DATA_FILEPATH
-import xml.etree.ElementTree as ET
+from . import pdp_utils
+from .pdp_utils import SKELETON_DATA_FILEPATH, SKELETON_DATA_NPZ_FILEPATH
 
-def create_vertex_groups(trm, joints, rig, bones, armature, filename):
+def get_vertex_group_names(joints, armature, filename) -> list[str]:
+    """Names of 'joints' vertex groups, from 'armature' names list or one picked by the filename for 'AUTO'"""
     # possible vertex group names, 10 per line for easier counting
     vg_names = [
         "root", "hips", "stomach", "chest", "torso", "neck", "head", "jaw", "jaw_lower", "jaw_upper",
@@ -52,22 +52,52 @@ def create_vertex_groups(trm, joints, rig, bones, armature, filename):
 
     len1 = len(gl)
     len2 = len(vg_names)
-    skel_size = len(rig.pose.bones) if rig and bones else 0
+    names = []
     for n in range(joints):
         if n < len1 and gl[n] < len2:
-            name = vg_names[gl[n]]
+            names.append(vg_names[gl[n]])
         else:
-            name = "Joint" + str(n)
+            names.append("Joint" + str(n))
+    return names
+
+def create_vertex_groups(trm, joints, rig, bones, armature, filename):
+    skel_size = len(rig.pose.bones) if rig and bones else 0
+    for n, name in enumerate(get_vertex_group_names(joints, armature, filename)):
         trm.vertex_groups.new(name=name)
         if skel_size and n < skel_size:
             pb = rig.pose.bones[bones[n]]
             pb.name = name
 
+SKELETON_KEY_PROP = 'trm_skeleton'
+"""Armature data property identifying its skeleton and import settings, for reuse by later imports"""
+
+def build_armature_bones(rig: bpy.types.Object, heads: np.ndarray, tails: np.ndarray, parents: np.ndarray) -> list[str]:
+    """Create all bones of 'rig' from armature space heads, tails and parent IDs in a single edit session"""
+    saved_active = bpy.context.view_layer.objects.active
+    saved_mode = bpy.context.mode
+    bpy.context.view_layer.objects.active = rig
+    bpy.ops.object.mode_set(mode='EDIT')
+
+    e_bones = rig.data.edit_bones
+    bones = [e_bones.new('Bone') for _ in range(len(parents))]
+    for bone, head, tail, p_ID in zip(bones, heads.tolist(), tails.tolist(), parents.tolist()):
+        bone.head = head
+        bone.tail = tail
+        if p_ID > -1:
+            bone.parent = bones[p_ID]
+    bone_names = [bone.name for bone in bones]
+
+    bpy.ops.object.mode_set(mode=saved_mode)
+    bpy.context.view_layer.objects.active = saved_active
+    return bone_names
+
 
 from bpy_extras.io_utils import ImportHelper
 from bpy.props import StringProperty, BoolProperty, EnumProperty, CollectionProperty, FloatProperty
 from bpy.types import Operator
-import os
+import os, pathlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 class TR123R_OT_ImportTRM(Operator, ImportHelper):
     """Load object from TRM file"""
@@ -116,10 +146,18 @@ class TR123R_OT_ImportTRM(Operator, ImportHelper):
 
     use_tex: BoolProperty(
         name="Use Textures",
-        description="Convert DDS texture files to PNG, import and apply to mesh",
+        description="Import DDS textures and apply them to mesh",
         default=False
     )
 
+    native_dds: BoolProperty(
+        name="Decode DDS Directly",
+        description="Decode DDS textures inside Blender and pack them into the .blend file\n"
+                    "instead of converting them to PNG files first.\n\n"
+                    "Supports uncompressed, BC1-BC5 and BC7 textures, others still go through the DDS Converter",
+        default=True
+    )
+
     tex_dir: EnumProperty(
         name="Game",
         description="Specify the game to look for the textures and armatures in.\n"
@@ -143,8 +181,9 @@ class TR123R_OT_ImportTRM(Operator, ImportHelper):
     import_armature: BoolProperty(
         name="Import Armature",
         description="Creates Armatures for imported models.\n\n"
-                    "Requires Skeleton Data to be Generated at least once. Happens automatically during a first import.\n"
-                    "Valid Game Directory path needs to be provided in addon's preferences in order to generate the data",
+                    "Bones are taken from generated Skeleton Data, or read straight from the game's .PDP files\n"
+                    "for models it doesn't have yet. Requires valid Game Directory path in addon's preferences\n"
+                    "or importing from the game's folder structure",
         default=True
     )
 
@@ -164,7 +203,27 @@ class TR123R_OT_ImportTRM(Operator, ImportHelper):
         default=False
     )
 
+    bulk_import: BoolProperty(
+        name="Import Whole Game Directory",
+        description="Ignore selected files and import every TRM found in\n"
+                    "Game Directory's 1, 2 and 3 folders into per-game collections.\n\n"
+                    "Requires valid Game Directory path in addon's preferences",
+        default=False
+    )
+
+    use_cache: BoolProperty(
+        name="Use Cache",
+        description="Keep decoded TRM data in addon's directory and reuse it\n"
+                    "when importing the same unchanged files again",
+        default=True
+    )
+
     skip_texconv = False
+    tex_queue: tex_convert.DDSConversionQueue = None
+    tex_files: tex_convert.TextureFileIndex = None
+    tex_images: dict[str, bpy.types.Image] = None
+    """Images by texture ID, filled once per import and kept up to date with imported textures"""
+    skeleton_armatures: dict[str, bpy.types.Armature] = None
 
     def load_png(self, mat: bpy.types.Material, path_png, nodes: bpy.types.Nodes):
         texture_node = nodes.new('ShaderNodeTexImage')
@@ -172,78 +231,91 @@ class TR123R_OT_ImportTRM(Operator, ImportHelper):
 
         return texture_node
 
+    def load_dds(self, mat: bpy.types.Material, tex_name, path_dds, nodes: bpy.types.Nodes):
+        """Decode DDS and write its pixels straight into a new packed image, raises DDSUnsupportedError if it can't"""
+        rgba = dds_decode.load(path_dds)
+        height, width = rgba.shape[:2]
+        image = bpy.data.images.new(f"{tex_name}.dds", width, height, alpha=True)
+        # Blender images start with the bottom row
+        pixels = np.flipud(rgba).astype(np.float32).ravel() / 255
+        image.pixels.foreach_set(pixels)
+        image.filepath_raw = path_dds
+        image.pack()
+
+        texture_node = nodes.new('ShaderNodeTexImage')
+        texture_node.image = image
+        return texture_node
+
     def import_texture(self, addon_prefs, tex_name, folders: list[tuple[str, int]], mat: bpy.types.Material, nodes):
-        tex_conv_path = addon_prefs.dds_tool_filepath
         png_export_path = addon_prefs.tex_conv_directory
         tex_node = None
         if not folders:
             return tex_node
         
         for folder, game_id in folders:
-            png_filename = f"{tex_name}.png"
-            if not png_export_path:
-                path_png_dir = Path.join(folder, 'PNGs')
-            else:
-                # if texture is not in custom PNG main directory, look for it in custom directory's game ID folder
-                if not Path.exists(Path.join(png_export_path, png_filename)):
-                    path_png_dir = Path.join(png_export_path, str(game_id))
-                else:
-                    path_png_dir = png_export_path
-            
-            path_png = Path.join(path_png_dir, png_filename)
-            path_dds = Path.join(folder, f"{tex_name}.dds")
+            path_png, path_dds, path_png_dir = tex_convert.texture_paths(tex_name, folder, game_id, png_export_path, self.tex_files.exists)
+            has_dds = self.tex_files.exists(path_dds)
 
             # Load the texture if PNG already exists
-            if Path.exists(path_png):
+            if self.tex_files.exists(path_png):
                 print(f"PNG located in: {path_png}")
                 tex_node = self.load_png(mat, path_png, nodes)
                 break
-            elif self.skip_texconv:
+            if self.native_dds and has_dds:
+                print(f"DDS located in: {path_dds}")
+                try:
+                    tex_node = self.load_dds(mat, tex_name, path_dds, nodes)
+                    break
+                except (OSError, dds_decode.DDSUnsupportedError) as e:
+                    print(f"Could not decode DDS: {e}")
+            if self.skip_texconv:
                 break
             # Convert DDS to PNG, if the DDS exists but not the PNG
-            elif Path.exists(path_dds):
+            elif has_dds:
                 print(f"DDS located in: {path_dds}")
 
-                # Create PNGs folder into "Tombraider Remastered Trilogy\[1,2,3]\TEX\" or other directory specified in prefs
-                if not Path.exists(path_png_dir):
-                    print(f"{path_png_dir} does not exists, creating...")
-                    os.makedirs(path_png_dir)
-                        
-                subprocess.run([tex_conv_path, path_dds, "-nologo", "-o", path_png_dir, "-ft", "png"])
-                tex_node = self.load_png(mat, path_png, nodes)
+                # Converter creates PNGs folder in "Tombraider Remastered Trilogy\[1,2,3]\TEX\" or other directory specified in prefs.
+                # Conversion may already be running or done, if it was queued ahead by the import
+                self.tex_queue.wait(path_dds, path_png_dir)
+                if Path.exists(path_png):
+                    self.tex_files.add(path_png)
+                    tex_node = self.load_png(mat, path_png, nodes)
                 break
             else:
                 self.report({'INFO'}, f"Texture '{tex_name}' not found in Game [{game_id}] folder!")
 
-        if not tex_node:
+        if tex_node:
+            self.tex_images[tex_name] = tex_node.image
+        else:
             self.report({'WARNING'}, f"Couldn't get texture '{tex_name}'! skipping texture import...")
 
         return tex_node
+
+    def index_images(self):
+        """Map texture IDs to already loaded images, with a single pass over bpy.data.images"""
+        self.tex_images = {}
+        for tx in bpy.data.images:
+            if tx.packed_file or Path.exists(tx.filepath):
+                self.tex_images.setdefault(tx.name.split('.', 1)[0], tx)
     
     def get_tex(self, tex_name:str, mat:bpy.types.Material):
         texture_node = None
-        tex = None
+        tex = self.tex_images.get(tex_name)
+        if not tex:
+            return texture_node, tex
 
         if mat.use_nodes:        
             # look for shader nodes with the texture
-            nodes = mat.node_tree.nodes
-            for node in nodes:
-                if node.type == 'TEX_IMAGE':
-                    node: bpy.types.ShaderNodeTexImage
-                    if node.image.name.startswith(tex_name) and Path.exists(node.image.filepath):
-                        self.report({'INFO'}, f'Node with "{tex_name}" texture already exists, assigning...')
-                        node.image.reload()
-                        texture_node = node
-                        tex = node.image
-                        break
+            for node in mat.node_tree.nodes:
+                if node.type == 'TEX_IMAGE' and node.image == tex:
+                    self.report({'INFO'}, f'Node with "{tex_name}" texture already exists, assigning...')
+                    if not tex.packed_file:
+                        tex.reload()
+                    texture_node = node
+                    break
 
         if not texture_node:
-            # look for the texture itself
-            for tx in bpy.data.images:
-                if tx.name.startswith(tex_name) and Path.exists(tx.filepath):
-                    self.report({'INFO'}, f'Texture "{tex_name}" already exists, assigning...')
-                    tex = tx
-                    break
+            self.report({'INFO'}, f'Texture "{tex_name}" already exists, assigning...')
 
         return texture_node, tex
 
@@ -253,7 +325,7 @@ class TR123R_OT_ImportTRM(Operator, ImportHelper):
         if import_tex:
             for folder, game_id in folders:
                 path_dds = Path.join(folder, f"{tex_name}.dds")
-                if Path.exists(path_dds):
+                if self.tex_files.exists(path_dds):
                     mat_suffix = "_Game-"+str(game_id)
                     break
                     
@@ -271,7 +343,8 @@ class TR123R_OT_ImportTRM(Operator, ImportHelper):
             
         return mat
     
-    def define_shader(self, index: int, type_name: str, sh_ids: trm_utils.TRM_ShaderIndices, trm_mesh: bpy.types.Mesh, is_single, has_gameID):
+    def define_shader(self, index: int, type_name: str, sh_ids: trm_utils.TRM_ShaderIndices, trm_mesh: bpy.types.Mesh, mat_ids: np.ndarray, is_single, has_gameID):
+        """Tag materials of polygons in the shader indices range, remapping their slots in 'mat_ids' in place"""
         def copy_mat(tex_name, mat_suffix, mat: bpy.types.Material):
             # Don't tag and duplicate the material with shader name if
             # it's from the first range of indices
@@ -306,11 +379,16 @@ class TR123R_OT_ImportTRM(Operator, ImportHelper):
         
         poly_start = int(sh_ids.offset/3)
         poly_stop = int((sh_ids.offset+sh_ids.length)/3)
+        range_ids = mat_ids[poly_start:poly_stop]
+
         added_mats = {}
-        # Find polygons in the given shader indices range and either rename
-        # or duplicate their exisitng materials, tagging them with shader index and subtype
-        for p in trm_mesh.polygons[poly_start:poly_stop]:
-            mat = trm_mesh.materials[p.material_index]
+        slot_mats = {}
+        # Find materials used by polygons in the given shader indices range and either rename
+        # or duplicate them, tagging them with shader index and subtype.
+        # Each slot is handled once, in order of its first polygon
+        slots, first_polys = np.unique(range_ids, return_index=True)
+        for slot in slots[np.argsort(first_polys)].tolist():
+            mat = trm_mesh.materials[slot]
             mat_name_slice = mat.name.split('_',4)
             tex_name, mat_suffix = [mat_name_slice[0], mat_name_slice[-1] if len(mat_name_slice)>1 and has_gameID else ""]
             tex_sh = f'{tex_name}_{index}'
@@ -320,7 +398,13 @@ class TR123R_OT_ImportTRM(Operator, ImportHelper):
             else:
                 mat = copy_mat(tex_name, mat_suffix, mat)
                 added_mats[tex_sh] = mat
-            p.material_index = trm_mesh.materials.find(mat.name)
+            slot_mats[slot] = mat
+
+        # Remap slots of the whole range at once, after all materials got their final slots
+        slot_map = np.arange(max(len(trm_mesh.materials), 1), dtype=np.int32)
+        for slot, mat in slot_mats.items():
+            slot_map[slot] = trm_mesh.materials.find(mat.name)
+        mat_ids[poly_start:poly_stop] = slot_map[range_ids]
 
         return added_mats.values()
 
@@ -365,7 +449,7 @@ class TR123R_OT_ImportTRM(Operator, ImportHelper):
 
             trm_utils.space_out_nodes(nodes_to_align)
 
-    def create_armature(self, filename:str, skeldata_path:str, game_id:str, trm:bpy.types.Object):
+    def create_armature(self, filename:str, skeldata_path:str, game_id:str, trm:bpy.types.Object, collection:bpy.types.Collection, game_dir:str=None, joints=0):
         def setup_armature(rig, existing=False):
             trm.parent = rig
             mod = None
@@ -386,232 +470,86 @@ class TR123R_OT_ImportTRM(Operator, ImportHelper):
         elif not game_id.isdigit():
             return None, None
         
-        skeldata = ET.parse(skeldata_path)
-        skeldata_root = skeldata.getroot()
-
-        # try to find TRM by its filename and cancel if not found
-        skeldata_arm = skeldata_root.find(f"./Game/[@ID='{game_id}']/Armature/[@name='{trm_name}']")
-        if not skeldata_arm:
+        # try to find TRM by its filename in Skeleton Data, else resolve just this model from game's PDPs
+        skeldata_arm = None
+        model_id = pdp_utils.get_model_id(game_id, trm_name)
+        if skeldata_path:
+            skeldata = skeleton_data.load(skeldata_path)
+            skeldata_arm = skeldata.get(game_id, trm_name)
+            if not skeldata_arm and model_id is not None:
+                skeldata_arm = skeldata.get_by_id(game_id, model_id)
+        if not skeldata_arm and game_dir and model_id is not None:
+            skeldata_arm = pdp_utils.find_skeleton(game_dir, game_id, model_id, trm_name)
+        # cancel if not found
+        if not skeldata_arm or not skeldata_arm.num_bones:
             self.report({'WARNING'}, f'Could not find Skeleton Data for "{trm_name}" in Game {game_id}. Skipping Armature creation...')
             return None, None
         
         # Look for a first armature with a name having the same substring as one found in TRM name
         rig_name = f'Rig_{trm_name}'
-        ob_name = next(iter([ob.name for ob in bpy.context.collection.objects if rig_name == ob.name and ob.type == 'ARMATURE']), "")
+        ob_name = next(iter([ob.name for ob in collection.objects if rig_name == ob.name and ob.type == 'ARMATURE']), "")
         if ob_name:
-            rig = bpy.context.collection.objects.get(ob_name)
+            rig = collection.objects.get(ob_name)
             setup_armature(rig, True)
             return rig, None
-            
-        saved_active = bpy.context.active_object
+
+        # Reuse armature data already built for the same skeleton and import settings, only a new object is needed.
+        # Bones get named after vertex groups of the first mesh using it, so their names are part of the key too
+        bone_vg_names = get_vertex_group_names(min(joints, skeldata_arm.num_bones), self.mesh_type, filename)
+        skeleton_key = '|'.join([f'{skeldata_arm.game_id}:{skeldata_arm.model_id}:{self.scale}:{self.connect_bones:d}:{self.auto_orient_bones:d}', *bone_vg_names])
+        armature = self.get_skeleton_armatures().get(skeleton_key)
+        if armature:
+            rig = bpy.data.objects.new(rig_name, armature)
+            collection.objects.link(rig)
+            setup_armature(rig)
+            return rig, None
+
         armature = bpy.data.armatures.new(rig_name)
+        armature[SKELETON_KEY_PROP] = skeleton_key
+        self.skeleton_armatures[skeleton_key] = armature
         rig = bpy.data.objects.new(rig_name, armature)
-        bpy.context.collection.objects.link(rig)
+        collection.objects.link(rig)
         setup_armature(rig)
 
-        bpy.context.view_layer.objects.active = rig
-        saved_mode = bpy.context.mode
-        bpy.ops.object.mode_set(mode='EDIT')
-        e_bones = armature.edit_bones
-
-        default_bone_length = 64
-        bone_names = []
-        skeldata_bones = skeldata_arm.findall("./Bone")
-        for skeldata_bone in skeldata_bones:
-            p_ID = int(skeldata_bone.attrib['p_ID'])
-            skeldata_bone_head = skeldata_bone.find("./Data/[@type='HEAD']")
-            skeldata_bone_tail = skeldata_bone.find("./Data/[@type='TAIL']")
-
-            bone = e_bones.new(f'Bone')
-            b_data_head = Vector(eval(skeldata_bone_head.attrib['Vector']))
-            b_head = Vector((b_data_head.x, b_data_head.z, b_data_head.y)) * -self.scale
-            if self.connect_bones and skeldata_bone_tail is not None:
-                b_data_tail = Vector(eval(skeldata_bone_tail.attrib['Vector']))
-                b_tail = Vector((b_data_tail.x, b_data_tail.z, b_data_tail.y)) * -self.scale
-            else:
-                b_tail = Vector((0, default_bone_length, 0)) * self.scale
+        heads, tails = self.get_bone_positions(skeldata_arm)
+        bone_names = build_armature_bones(rig, heads, tails, skeldata_arm.parents)
 
-            b_tail += b_head
+        return rig, bone_names
 
+    def get_bone_positions(self, skeldata_arm: skeleton_data.SkeletonArmature) -> tuple[np.ndarray, np.ndarray]:
+        """Armature space heads and tails of all bones, in Blender's axes and import scale"""
+        default_bone_length = 64
+        default_tail = np.array((0, default_bone_length, 0)) * self.scale
+        # swap Y and Z to Blender's up axis and scale all bone vectors at once
+        heads = skeldata_arm.heads[:, [0, 2, 1]].astype(np.float64) * -self.scale
+        use_tail = self.connect_bones & skeldata_arm.has_tail
+        # tails relative to bone's head
+        tails = np.where(use_tail[:, None], skeldata_arm.tails[:, [0, 2, 1]] * -self.scale, default_tail)
+
+        # parents always come before their children, so a single pass moves heads to parent's head
+        for b, p_ID in enumerate(skeldata_arm.parents.tolist()):
             if p_ID > -1:
-                bone.parent = e_bones[p_ID]
-                if self.auto_orient_bones and self.connect_bones and skeldata_bone_tail is None:
-                    parent_bone_direction = Vector(bone.parent.tail - bone.parent.head).normalized()
-                    b_tail = parent_bone_direction * default_bone_length * self.scale
-                    b_tail += b_head
-
-                bone.head = b_head
-                bone.tail = b_tail
-                bone.translate(bone.parent.head)
-            else:
-                bone.head = b_head
-                bone.tail = b_tail
-
-            bone_names.append(bone.name)
-
-        bpy.ops.object.mode_set(mode=saved_mode)
-        bpy.context.view_layer.objects.active = saved_active
-
-        return rig, bone_names
+                if self.auto_orient_bones and self.connect_bones and not use_tail[b]:
+                    length = np.linalg.norm(tails[p_ID])
+                    tails[b] = tails[p_ID] / length * default_bone_length * self.scale if length else 0
+                heads[b] += heads[p_ID]
+
+        return heads, heads + tails
+
+    def get_skeleton_armatures(self) -> dict[str, bpy.types.Armature]:
+        """Armature data built by previous imports, by skeleton key"""
+        if self.skeleton_armatures is None:
+            self.skeleton_armatures = {a[SKELETON_KEY_PROP]: a for a in bpy.data.armatures if SKELETON_KEY_PROP in a}
+        return self.skeleton_armatures
     
-    def normal_byte_to_float(self, xyz:tuple[int, int, int]):
-        vec = Vector([b-127 for b in xyz])
-        vec.normalize()
-        vec.negate()
-        return vec
-    
-    def read_trm_data(self, context, filepath, addon_prefs, filename, skeldata_path):
-        print("IMPORTING...")
-        f = open(filepath, 'rb')
-
-        # TRM\x02 marker
-        if unpack('>I', f.read(4))[0] != bin_parse.TRM_HEADER:
-            self.report({'ERROR'}, "Not a TRM file!")
-            return {'CANCELLED'}
-
-        # SHADERS
-        shaders: list[trm_utils.TRM_Shader] = []
-        num_shaders = bin_parse.read_uint32(f)
-        for n in range(num_shaders):
-            sh_type = bin_parse.read_uint32(f)
-            sh_uks = []
-            # 4 unknown pieces of data
-            for i in range(4):
-                uks_floats = [round(v/255, 4) for v in bin_parse.read_uint8_tuple(f, 4)]
-                sh_uks.append(uks_floats)
-
-            sh_ids_list = []
-            # 3 pieces of indice data
-            for i in range(3):
-                sh_ids = bin_parse.read_uint32_tuple(f, 2)
-                sh_ids_list.append(trm_utils.TRM_ShaderIndices(sh_ids[0], sh_ids[1]))
-            shader = trm_utils.TRM_Shader(sh_type, sh_uks[0], sh_uks[1], sh_uks[2], sh_uks[3], sh_ids_list[0], sh_ids_list[1], sh_ids_list[2])
-            shaders.append(shader)
-            # print(f"Shader[{n}]: {shader}\n")
-
-        # TEXTURES
-        num_textures = bin_parse.read_uint32(f)
-        textures = bin_parse.read_ushort16_tuple(f, num_textures)
-
-        # BYTE ALIGN
-        if f.tell() % 4: f.read(4 - (f.tell()%4))
-
-        # UNKNOWN ANIMATION DATA - STORE IN SEPARATE FILE
-        num_anim_bones = bin_parse.read_uint32(f)
-        if num_anim_bones > 0:
-            anim_bones = tuple(bin_parse.read_float_tuple(f, 12) for n in range(num_anim_bones))
-                
-            num_anim_unknown2 = bin_parse.read_uint32(f)
-            anim_unknown2 = tuple(bin_parse.read_uint32_tuple(f, 2) for n in range(num_anim_unknown2))
-            
-            num_anim_unknown3 = bin_parse.read_uint32(f)
-            anim_unknown3 = bin_parse.read_uint32_tuple(f, num_anim_unknown3) # Frame numbers?
-            
-            # print(f'num unknown 4 offset: {hex(f.tell())}')
-            num_anim_unknown4 = bin_parse.read_ushort16(f)
-            # print(f'num unknown 5 offset: {hex(f.tell())}')
-            num_anim_unknown5 = bin_parse.read_ushort16(f)  # this is unused, still unknown
-            # print(f'unknown 3x4 offset: {hex(f.tell())}')
-            anim_unknown4 = tuple(bin_parse.read_float_tuple(f, 12) for n in range(num_anim_unknown3 * num_anim_unknown4))
-            # anim_unknown4 = unpack('<%df' % (num_anim_unknown4*num_anim_unknown3*12), f.read(48*num_anim_unknown4*num_anim_unknown3))
-            # print(f'end of anim data offset: {hex(f.tell())}')
-
-            trm_anim_filepath = f'{self.directory}{filename}{bin_parse.TRM_ANIM_FORMAT}'
-            print("-------------------------------------------------")
-            print(f'SAVING UNKNOWN ANIM DATA TO "{trm_anim_filepath}" FILE...')
-            from struct import pack
-            with open(trm_anim_filepath, 'w+b') as f_anim:
-                # TRM\x02 marker
-                f_anim.write(pack(">I", bin_parse.TRM_HEADER))
-
-                f_anim.write(pack("<I", num_anim_bones))
-                f_anim.write(pack("<%df" % (12*num_anim_bones), *[x for y in anim_bones for x in y]))
-                f_anim.write(pack("<I", num_anim_unknown2))
-                f_anim.write(pack("<%dI" % (2*num_anim_unknown2), *[x for y in anim_unknown2 for x in y]))
-                f_anim.write(pack("<I", num_anim_unknown3))
-                f_anim.write(pack("<%dI" % num_anim_unknown3, *anim_unknown3))
-                f_anim.write(pack("<H", num_anim_unknown4))
-                f_anim.write(pack("<H", num_anim_unknown5))
-                f_anim.write(pack("<%df" % (12*num_anim_unknown3 * num_anim_unknown4), *[x for y in anim_unknown4 for x in y]))
-            del pack
-            self.report({'INFO'}, f'Animation data extracted to "{trm_anim_filepath}". Use this file to export this model back to the game.')
-            
-            # DEBUG
-            if False:
-                print(f'Bone amount: {num_anim_bones}')
-                n = 0
-                if n > -1:
-                    print(f'Bone data at [{n}]: {anim_bones[n]}')
-                else:
-                    print(f'Bone data: {anim_bones}')
-
-                print(f'Animation Data2: {num_anim_unknown2}')
-                n = -1
-                if n > -1:
-                    print(f'Unknown data 2 at [{n}]: {anim_unknown2[n]}')
-                else:
-                    print(f'Unknown data 2: {anim_unknown2}')
-
-                print(f'Animation Data3: {num_anim_unknown3}')
-                n = -1
-                if n > -1:
-                    print(f'Unknown data 3 at [{n}]: {anim_unknown3[n]}')
-                else:
-                    print(f'Unknown data 3: {anim_unknown3}')
-
-                print(f'Animation Data4: {num_anim_unknown4}')
-                print(f'Animation Data5: {num_anim_unknown5}')
-                n = 0
-                if n > -1:
-                    print(f'Unknown data 4 at [{n}]: {anim_unknown4[n]}')
-                else:
-                    print(f'Unknown data 4: {anim_unknown4}')
-
-
-        # INDICE & VERTICE COUNTS
-        num_indices = bin_parse.read_uint32(f)
-        num_vertices = bin_parse.read_uint32(f)
-
-        # READ INDICES
-        indices = bin_parse.read_ushort16_tuple(f, num_indices)
-
-        # BYTE ALIGN
-        if f.tell() % 4: f.read(4 - (f.tell()%4))
-
-        # READ VERTICES
-        vertices = []
-        max_joint = 0
-        for n in range(num_vertices):
-            vertex = unpack("<fff12B", f.read(24))
-            vertices.append(vertex)
-            max_joint = max(vertex[7], vertex[8], vertex[9], max_joint)
-
-        f.close()
-
-        print("%d Shaders, %d Textures, %d Indices, %d Vertices, %d Bones" % (num_shaders, num_textures, num_indices, num_vertices, max_joint + 1))
-
-        # CREATE OBJECT
-        trm_mesh = bpy.data.meshes.new(f'{filename}_Mesh')
-        trm = bpy.data.objects.new(filename, trm_mesh)
-
-        trm_vertices = []
-        trm_edges = []
-        trm_faces = []
-
-        for n in range(num_vertices):
-            v = vertices[n]
-            trm_vertices.append([-v[0] * self.scale, -v[2] * self.scale, -v[1] * self.scale])
-
-        for n in range(0, num_indices, 3):
-            trm_faces.append([indices[n], indices[n+2], indices[n+1]])
-
-        trm_mesh.from_pydata(trm_vertices, trm_edges, trm_faces, shade_flat=False)
-        trm_mesh.update()
-
+    def get_folders(self, filepath, addon_prefs, game_id:str=None) -> tuple[list[tuple[str, int]] | None, str]:
+        """Get lookup folders for textures (TEX) or armatures (game folders) of the TRM file and its game ID"""
         # Get folders in game's or relative TRM path
         folders = None
         if self.use_tex or self.import_armature:
-            if self.tex_dir == 'REL':
+            if game_id:
+                game_dir = addon_prefs.game_path
+            elif self.tex_dir == 'REL':
                 # File folder, these modifications assume we're dealing with files from the Remasters.
                 folder = Path.dirname(filepath)
                 game_dir = f"{folder}/../.."
@@ -635,6 +573,80 @@ class TR123R_OT_ImportTRM(Operator, ImportHelper):
                 self.report({'WARNING'}, f'{type(e).__name__}, Invalid Path: "{Path.abspath(game_dir)}" for filepath "{filepath}" is not in directory with correct game structure!\nSkipping armature and texture import...')
                 folders = None
 
+        return folders, game_id
+
+    def read_trm_data(self, context, filepath, addon_prefs, filename, skeldata_path, trm_data: trm_format.TRM_Data, folders=None, game_id:str=None, collection:bpy.types.Collection=None):
+        print("IMPORTING...")
+        if not collection:
+            collection = bpy.context.collection
+
+        # SHADERS
+        shaders: list[trm_utils.TRM_Shader] = []
+        for sh in trm_data.shaders:
+            sh_uks = [[round(v/255, 4) for v in d.to_bytes(4, 'little')] for d in sh.data]
+            shader = trm_utils.TRM_Shader(sh.type, *sh_uks, *sh.indices)
+            shaders.append(shader)
+        num_shaders = len(shaders)
+
+        # TEXTURES
+        textures = trm_data.textures.tolist()
+        num_textures = len(textures)
+
+        # UNKNOWN ANIMATION DATA - STORE IN SEPARATE FILE
+        if trm_data.anim:
+            trm_anim_filepath = Path.join(Path.dirname(filepath), f'{filename}{bin_parse.TRM_ANIM_FORMAT}')
+            print("-------------------------------------------------")
+            print(f'SAVING UNKNOWN ANIM DATA TO "{trm_anim_filepath}" FILE...')
+            trm_format.dump_anim(trm_data.anim, trm_anim_filepath)
+            self.report({'INFO'}, f'Animation data extracted to "{trm_anim_filepath}". Use this file to export this model back to the game.')
+
+        indices = trm_data.indices
+        vertices = trm_data.vertices
+        num_indices = len(indices)
+        num_vertices = len(vertices)
+        max_joint = trm_data.num_joints - 1
+
+        print("%d Shaders, %d Textures, %d Indices, %d Vertices, %d Bones" % (num_shaders, num_textures, num_indices, num_vertices, max_joint + 1))
+
+        # CREATE OBJECT
+        trm_mesh = bpy.data.meshes.new(f'{filename}_Mesh')
+        trm = bpy.data.objects.new(filename, trm_mesh)
+
+        # vertices in XZY order, faces with flipped winding
+        trm_vertices = vertices['pos'][:, [0, 2, 1]] * -self.scale
+        trm_faces = indices.reshape(-1, 3)[:, [0, 2, 1]]
+        num_faces = len(trm_faces)
+
+        # merge edges along UV seams
+        if self.merge_uv:
+            kept_verts, weld_map, seam_edges = trm_format.weld_boundary_vertices(trm_vertices, trm_faces, dist=0.0001)
+            mesh_verts = vertices[kept_verts]
+            mesh_co = trm_vertices[kept_verts]
+            mesh_faces = weld_map[trm_faces]
+        else:
+            mesh_verts = vertices
+            mesh_co = trm_vertices
+            mesh_faces = trm_faces
+
+        trm_mesh.vertices.add(len(mesh_verts))
+        trm_mesh.vertices.foreach_set('co', mesh_co.astype(np.float32).ravel())
+        trm_mesh.loops.add(num_indices)
+        trm_mesh.loops.foreach_set('vertex_index', mesh_faces.astype(np.int32).ravel())
+        trm_mesh.polygons.add(num_faces)
+        trm_mesh.polygons.foreach_set('loop_start', np.arange(0, num_indices, 3, dtype=np.int32))
+        if bpy.app.version < (4,0):
+            trm_mesh.polygons.foreach_set('loop_total', np.full(num_faces, 3, dtype=np.int32))
+        trm_mesh.polygons.foreach_set('use_smooth', np.ones(num_faces, dtype=bool))
+        trm_mesh.update(calc_edges=True)
+
+        if self.merge_uv and len(seam_edges):
+            edge_verts = np.empty(len(trm_mesh.edges)*2, dtype=np.int32)
+            trm_mesh.edges.foreach_get('vertices', edge_verts)
+            edge_verts = np.sort(edge_verts.reshape(-1, 2), axis=1).astype(np.int64)
+            seam_keys = seam_edges[:, 0] * len(mesh_verts) + seam_edges[:, 1]
+            edge_keys = edge_verts[:, 0] * len(mesh_verts) + edge_verts[:, 1]
+            trm_mesh.edges.foreach_set('use_seam', np.isin(edge_keys, seam_keys))
+
         import_tex = self.use_tex and bool(folders)
         
         # CREATE MATERIALS WITH RANDOM COLOR
@@ -643,9 +655,8 @@ class TR123R_OT_ImportTRM(Operator, ImportHelper):
             mat = self.create_material(tex_name, folders, import_tex)
             trm_mesh.materials.append(mat)
 
-        # ASSIGN MATERIALS
-        for p in trm_mesh.polygons:
-            p.material_index = vertices[p.vertices[1]][6] - 1
+        # ASSIGN MATERIALS, shaders remap their ranges and slots get written once afterwards
+        face_tex = vertices['tex'][trm_faces[:, 1]].astype(np.int32) - 1
 
         # DEFINE SHADERS
         mat_shaders = set()
@@ -654,19 +665,20 @@ class TR123R_OT_ImportTRM(Operator, ImportHelper):
             is_single_shader = num_shaders == 1
             shader_inst_node = trm_utils.get_TRM_shader_inst_ntree(shader_node_master, filename, sh, i)
             if sh.indices1.length > 0:
-                mats = self.define_shader(i, trm_utils.SHADER_SUBTYPES[0], sh.indices1, trm_mesh, is_single_shader, import_tex)
+                mats = self.define_shader(i, trm_utils.SHADER_SUBTYPES[0], sh.indices1, trm_mesh, face_tex, is_single_shader, import_tex)
                 self.setup_materials(shader_inst_node, trm_utils.SHADER_SUBTYPES[0], trm_mesh, mats, folders, addon_prefs)
                 mat_shaders.update(mats)
                 is_single_shader = False
             if sh.indices2.length > 0:
-                mats = self.define_shader(i, trm_utils.SHADER_SUBTYPES[1], sh.indices2, trm_mesh, is_single_shader, import_tex)
+                mats = self.define_shader(i, trm_utils.SHADER_SUBTYPES[1], sh.indices2, trm_mesh, face_tex, is_single_shader, import_tex)
                 self.setup_materials(shader_inst_node, trm_utils.SHADER_SUBTYPES[1], trm_mesh, mats, folders, addon_prefs)
                 mat_shaders.update(mats)
                 is_single_shader = False
             if sh.indices3.length > 0:
-                mats = self.define_shader(i, trm_utils.SHADER_SUBTYPES[2], sh.indices3, trm_mesh, is_single_shader, import_tex)
+                mats = self.define_shader(i, trm_utils.SHADER_SUBTYPES[2], sh.indices3, trm_mesh, face_tex, is_single_shader, import_tex)
                 self.setup_materials(shader_inst_node, trm_utils.SHADER_SUBTYPES[2], trm_mesh, mats, folders, addon_prefs)
                 mat_shaders.update(mats)
+        trm_mesh.polygons.foreach_set('material_index', face_tex)
         
         # CUBEMAPS
         for mat in trm_mesh.materials:
@@ -680,121 +692,176 @@ class TR123R_OT_ImportTRM(Operator, ImportHelper):
         # CREATE UV DATA
         trm_mesh.uv_layers.new()
         uvs = trm_mesh.uv_layers.active
-        for p in trm_mesh.polygons:
-            for i in p.loop_indices:
-                v = trm_mesh.loops[i].vertex_index
-                uvs.data[i].uv = (vertices[v][10] / 255, (255 - vertices[v][14]) / 255)
+        vert_uvs = np.column_stack((vertices['u'] / 255, (255 - vertices['v']) / 255)).astype(np.float32)
+        uvs.data.foreach_set('uv', vert_uvs[trm_faces.ravel()].ravel())
         
         # CREATE ARMATURE
-        if skeldata_path:
-            rig, bone_names = self.create_armature(filename, skeldata_path, game_id, trm)
+        if self.import_armature:
+            game_dir = addon_prefs.game_path
+            if not Path.exists(Path.join(game_dir, 'tomb123.exe')):
+                # assume the Remasters' folder structure around the file
+                game_dir = Path.abspath(Path.join(Path.dirname(filepath), '..', '..'))
+            rig, bone_names = self.create_armature(filename, skeldata_path, game_id, trm, collection, game_dir, max_joint + 1)
         else:
             rig, bone_names = None, None
 
         # CREATE & ASSIGN VERTEX GROUPS
         create_vertex_groups(trm, max_joint + 1, rig, bone_names, self.mesh_type, filename)
-        for n in range(num_vertices):
-            g = trm.vertex_groups
-            v = vertices[n]
-            for v_i, v_w in enumerate(range(11, 14), 7):
-                g_weight = v[v_w]
-                g_id = v[v_i]
-                if g_weight > 0:
-                    g[g_id].add([n], g_weight/255, 'ADD')
+        g = trm.vertex_groups
+        g_verts = np.repeat(np.arange(len(mesh_verts)), 3)
+        g_ids = mesh_verts['joints'].ravel().astype(np.int32)
+        g_weights = mesh_verts['weights'].ravel().astype(np.int32)
+        has_weight = g_weights > 0
+        # bucket every influence by joint ID and weight, so each bucket is added with a single call
+        g_buckets = (g_ids[has_weight] << 8) | g_weights[has_weight]
+        order = np.argsort(g_buckets, kind='stable')
+        g_buckets, g_verts = g_buckets[order], g_verts[has_weight][order]
+        buckets, bucket_starts = np.unique(g_buckets, return_index=True)
+        for bucket, verts in zip(buckets.tolist(), np.split(g_verts, bucket_starts[1:])):
+            g[bucket >> 8].add(verts.tolist(), (bucket & 0xff)/255, 'ADD')
 
         # CREATE NORMALS
-        trm_normals = []
-
-        for n in range(num_vertices):
-            v = vertices[n]
-            normal = self.normal_byte_to_float((v[3], v[5], v[4]))
-            trm_normals.append(normal)
-
-        trm_mesh.normals_split_custom_set_from_vertices(trm_normals)
+        # normals in XZY order, set per face corner to keep them split along welded UV seams
+        trm_normals = trm_format.normals_from_bytes(vertices['normal'][:, [0, 2, 1]])
+        trm_mesh.normals_split_custom_set(trm_normals[trm_faces.ravel()])
         if bpy.app.version < (4,1):
             trm_mesh.use_auto_smooth = True
             trm_mesh.calc_normals_split()
         trm_mesh.update()
 
-        # merge edges along UV seams
-        if self.merge_uv:
-            split_normals = []
-            for l in trm_mesh.loops:
-                split_normals.append(l.normal.copy())
-
-            import bmesh
-
-            trm_bmesh = bmesh.new()
-            trm_bmesh.from_mesh(trm_mesh)
-            verts_to_merge = set()
-
-            for e in trm_bmesh.edges:
-                if e.is_boundary:
-                    e.seam = True
-                    for v in e.verts:
-                        verts_to_merge.add(v)
-            bmesh.ops.remove_doubles(trm_bmesh, verts=list(verts_to_merge), dist=0.0001)
-
-            for e in trm_bmesh.edges:
-                if not e.is_manifold:
-                    e.seam = False
-
-            trm_bmesh.to_mesh(trm_mesh)
-            trm_bmesh.free()
-
-            try:
-                trm_mesh.normals_split_custom_set(split_normals)
-            except Exception as e:
-                self.report({'ERROR'}, f'{e}\nCould not merge mesh by UV seams for "{filename}".\nDisable "Merge by UVs" and try again.')
-                # cleanup created data
-                # (some will remain, it's more work than it's worth to track everything down)
-                for mat in trm_mesh.materials:
-                    bpy.data.materials.remove(mat)
-                bpy.data.meshes.remove(trm_mesh)
-                if rig:
-                    bpy.data.armatures.remove(rig.data)
-                return {'CANCELLED'}
-            trm_mesh.update()
-
         trm_mesh.validate()
 
-        bpy.context.collection.objects.link(trm)
+        collection.objects.link(trm)
 
         print("DONE!")
         return {'FINISHED'}
 
+    def get_game_collection(self, context, game_id:str) -> bpy.types.Collection:
+        """Get or create a collection for bulk imported TRMs of the given game"""
+        col_name = f'TRM Game-{game_id}'
+        collection = bpy.data.collections.get(col_name)
+        if not collection:
+            collection = bpy.data.collections.new(col_name)
+        if col_name not in context.scene.collection.children:
+            context.scene.collection.children.link(collection)
+        return collection
+
+    def load_trm_files(self, filepaths: list[str], loader=trm_format.load):
+        """Decode TRM files in worker threads, yielding futures in order of 'filepaths'.\n
+        Only a limited amount of files is decoded ahead of the consumer, so big batches don't pile up in memory."""
+        max_workers = os.cpu_count() or 1
+        with ThreadPoolExecutor(max_workers) as pool:
+            trm_futures = deque()
+            for filepath in filepaths:
+                trm_futures.append(pool.submit(loader, filepath))
+                if len(trm_futures) > max_workers * 2:
+                    yield trm_futures.popleft()
+            while trm_futures:
+                yield trm_futures.popleft()
+
     def execute(self, context):
         start_time = time.process_time()
-        if len(self.files) == 1:
+        if self.bulk_import:
+            self.report({'INFO'}, "Importing all TRM files from Game Directory...")
+        elif len(self.files) == 1:
             self.report({'INFO'}, "Importing TRM...%r" % self.filepath)
         else:
             self.report({'INFO'}, "Importing TRM files...")
 
         addon_prefs = bpy.context.preferences.addons[__package__].preferences
         texconv_path = addon_prefs.dds_tool_filepath
-        if self.use_tex and (not Path.exists(texconv_path) or not texconv_path.endswith('.exe')):
-            self.report({'WARNING'}, f'Wrong DDS Converter path or file type: "{texconv_path}", skipping texture conversion...')
-            self.skip_texconv = True
+        if self.use_tex and not Path.isfile(texconv_path):
+            if self.native_dds:
+                print(f'DDS Converter not found at "{texconv_path}", only natively decoded textures will be imported')
+                self.skip_texconv = True
+            else:
+                self.report({'WARNING'}, f'Wrong DDS Converter path or file type: "{texconv_path}", skipping texture conversion...')
+                self.skip_texconv = True
 
         if self.import_armature:
             addon_dir = os.path.dirname(__file__)
-            skeldata_path = os.path.join(addon_dir, SKELETON_DATA_FILEPATH)
-            # Generate missing SkeletonData.xml on a first import that can create an armature
-            # TODO: Support more/all TRMs - this will require pairing TRM names with model IDs
-            if not os.path.exists(skeldata_path):
-                print("Generating Skeleton Data...")
-                result = bpy.ops.io_tombraider123r.generate_skeleton_data()
-                if result == {'CANCELLED'}:
-                    self.report({'ERROR'}, "Could not generate Skeleton Data!\nCheck if Game Directory path in addon's preferences is provided. Armature not imported.")
-                    skeldata_path = None
+            # Prefer compact Skeleton Data, XML is read only if it was generated by an older version
+            # Without any, bones of each model are resolved from game's PDP files when needed
+            skeldata_path = next((p for p in (os.path.join(addon_dir, SKELETON_DATA_NPZ_FILEPATH), os.path.join(addon_dir, SKELETON_DATA_FILEPATH))
+                                  if os.path.exists(p)), None)
         else:
             skeldata_path = None
 
-        for f in self.files:
-            filepath = Path.join(self.directory, f.name)
-        
-            obj_name = str(f.name).removesuffix(self.filename_ext)
-            result = self.read_trm_data(context, filepath, addon_prefs, obj_name, skeldata_path)
+        # list of (filepath, game ID, target collection) to import
+        trm_files = []
+        if self.bulk_import:
+            if not Path.exists(Path.join(addon_prefs.game_path, 'tomb123.exe')):
+                self.report({'ERROR'}, f'Game Directory "{addon_prefs.game_path}" is not valid! Bulk import cancelled.')
+                return {'CANCELLED'}
+
+            for game_id in ('1', '2', '3'):
+                game_files = sorted(p for p in pathlib.Path(addon_prefs.game_path, game_id).rglob('*') if p.suffix.upper() == self.filename_ext)
+                if game_files:
+                    collection = self.get_game_collection(context, game_id)
+                    trm_files.extend((str(p), game_id, collection) for p in game_files)
+
+            if not trm_files:
+                self.report({'WARNING'}, f'No {self.filename_ext} files found in Game Directory "{addon_prefs.game_path}"!')
+                return {'CANCELLED'}
+        else:
+            trm_files = [(Path.join(self.directory, f.name), None, None) for f in self.files]
+
+        # Resolve lookup folders up front, so textures can be queued for conversion as soon as a file is decoded
+        trm_folders = {}
+        for filepath, game_id, _ in trm_files:
+            trm_folders[filepath] = self.get_folders(filepath, addon_prefs, game_id)
+
+        loader = trm_format.load
+        if self.use_cache:
+            cache_dir = os.path.join(os.path.dirname(__file__), trm_cache.TRM_CACHE_DIRPATH)
+            loader = trm_cache.TRMCache(cache_dir, addon_prefs.trm_cache_size * 1024**2).load
+
+        if self.use_tex:
+            self.tex_files = tex_convert.TextureFileIndex()
+            self.index_images()
+        if self.use_tex and not self.skip_texconv:
+            self.tex_queue = tex_convert.DDSConversionQueue(tex_convert.DDSConverter(texconv_path))
+
+        # runs in worker threads, so it only uses plain Python values read here and never touches bpy/RNA
+        # when decoding natively, only textures it can't handle get converted, on demand
+        tex_queue = self.tex_queue if not self.native_dds else None
+        tex_exists = self.tex_files.exists if tex_queue else None
+        tex_conv_directory = addon_prefs.tex_conv_directory
+
+        def load_and_prefetch(filepath):
+            trm_data = loader(filepath)
+            folders = trm_folders[filepath][0]
+            if tex_queue and folders:
+                tex_names = [str(t) for t in trm_data.textures.tolist()]
+                tex_queue.prefetch(tex_names, folders, tex_conv_directory, tex_exists)
+            return trm_data
+
+        result = {'CANCELLED'}
+        wm = context.window_manager
+        wm.progress_begin(0, len(trm_files))
+        trm_loaded = self.load_trm_files([filepath for filepath, _, _ in trm_files], load_and_prefetch)
+        try:
+            for n, ((filepath, _, collection), trm_future) in enumerate(zip(trm_files, trm_loaded)):
+                obj_name = Path.basename(filepath).removesuffix(self.filename_ext)
+                try:
+                    trm_data = trm_future.result()
+                except (trm_format.TRMFormatError, OSError) as e:
+                    self.report({'ERROR'}, f'{e} "{filepath}"')
+                    result = {'CANCELLED'}
+                    continue
+                finally:
+                    wm.progress_update(n)
+
+                folders, game_id = trm_folders[filepath]
+                result = self.read_trm_data(context, filepath, addon_prefs, obj_name, skeldata_path, trm_data, folders, game_id, collection)
+        finally:
+            wm.progress_end()
+            if self.tex_queue:
+                self.tex_queue.shutdown()
+                self.tex_queue = None
+            self.tex_files = None
+            self.tex_images = None
+            self.skeleton_armatures = None
 
         end_time = time.process_time() - start_time
         if result != {'CANCELLED'}:
@@ -820,17 +887,24 @@ class TR123R_OT_ImportTRM(Operator, ImportHelper):
         layout.use_property_split = True
         layout.use_property_decorate = False  # No animation.
 
+        layout.prop(self, 'bulk_import')
         layout.prop(self, 'scale')
         layout.prop(self, 'mesh_type')
         layout.prop(self, 'merge_uv')
+        layout.prop(self, 'use_cache')
         layout.prop(self, 'import_armature')
         if self.import_armature:
             layout.prop(self, 'connect_bones')
             if self.connect_bones:
                 layout.prop(self, 'auto_orient_bones')
         layout.prop(self, 'use_tex')
+        if self.use_tex:
+            layout.prop(self, 'native_dds')
 
-        if self.use_tex or self.import_armature:
+        if self.bulk_import:
+            if not addon_prefs.game_path:
+                self.draw_warning(layout, "Game path is not provided!")
+        elif self.use_tex or self.import_armature:
             col = layout.column()
             if addon_prefs.game_path:
                 use_texdir = True                
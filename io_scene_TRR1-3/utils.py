@@ -1,6 +1,7 @@
 import bpy, struct
 from typing import NamedTuple
 from mathutils import Vector
+from .trm_format import TRM_ShaderIndices
 
 TRM_SCALE = 100
 
@@ -13,14 +14,6 @@ SHADER_DATA_NAMES = ["Shader Type", "Color 1", "Color 2", "Color 3", "Color 4"]
 SHADERNODE_NAME_MAIN = "TRM_MainShader"
 SHADERNODE_NAME_INST = "TRM_ShaderInstance"
 
-class TRM_ShaderIndices(NamedTuple):
-    """Vertex Indices tuple[offset, length] for Shader data of TRM file"""
-    offset: int = 0
-    """Face vertex offset at which shader subtype begins its range."""
-    length: int  = 0
-    """Amount of face vertices which the shader subtype is defined for."""
-
-
 class TRM_Shader(NamedTuple):
     """Shader data for TRM file"""
     type: int = 0